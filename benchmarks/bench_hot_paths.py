@@ -0,0 +1,156 @@
+"""Benchmarks for the tracker hot paths, run entirely offline.
+
+    pip install pytest-benchmark
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-only
+
+Providers are served by the local stand-ins in fake_providers.py, so numbers
+reflect our own overhead plus the configured latency, not the public APIs.
+"""
+import http.client
+import math
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE.parent), str(HERE)]
+
+import sigma_imei_tracking as sit
+import sigma_map_server
+from fake_providers import FakeProviders
+
+DEGRADED = {
+    "healthy": {},
+    "slow_primary": {"ipapi_co": {"latency": 1.5}},
+    "flaky": {"ipapi_co": {"error_rate": 0.5}, "ipinfo_io": {"error_rate": 0.5}},
+    "hanging_primary": {"ipapi_co": {"hang_rate": 1.0, "hang_for": 3.0}},
+    "all_down": {name: {"error_rate": 1.0} for name in ("ipapi_co", "ipinfo_io", "abstract_api")}
+}
+
+def make_tracker(fake, concurrent):
+    gps = sit.GPSTracker(concurrent=concurrent, deadline=2.0, urls=fake.urls(),
+                         transport=sit.ProviderTransport(timeout=2.0, retries=0))
+    # geocoder.ip('me') talks to ipinfo.io directly and can't be redirected
+    gps.services.remove(gps._geocoder_ip)
+    return gps
+
+@pytest.mark.parametrize("concurrent", [True, False], ids=["race", "sequential"])
+@pytest.mark.parametrize("scenario", list(DEGRADED))
+def test_get_location(benchmark, scenario, concurrent):
+    with FakeProviders(**{name: dict(cfg, jitter=0.02) for name, cfg in DEGRADED[scenario].items()}) as fake:
+        gps = make_tracker(fake, concurrent)
+        result = benchmark.pedantic(gps.get_location, rounds=10, iterations=1, warmup_rounds=1)
+        if scenario != "all_down":
+            assert result["ip"] == "203.0.113.7"
+
+def test_get_location_cached(benchmark):
+    with FakeProviders() as fake:
+        gps = make_tracker(fake, True)
+        gps.cache = sit.GeoCache(path=None)
+        gps.get_location()
+        benchmark(gps.get_location)
+        assert gps.cache.hits > 0
+
+def test_format_log_line(benchmark):
+    line = "[12:00:00] 📡 TARGET 490154203237518 → IP: 203.0.113.7 | LOCATION: London | TRACKING ACTIVE"
+    benchmark(sit.SigmaTracker.format_log_line, line)
+
+def test_log_throughput(benchmark):
+    """Enqueue + drain 5000 lines into a real console widget (needs a display)"""
+    try:
+        root = sit.tk.Tk()
+    except sit.tk.TclError:
+        pytest.skip("no display available for Tk")
+    root.withdraw()
+    app = sit.SigmaTracker.__new__(sit.SigmaTracker)
+    app.root = root
+    app.log_queue = sit.queue.SimpleQueue()
+    app.console_lines = 0
+    app.spill_log = sit.make_spill_logger(path=os.devnull)
+    app.console = sit.scrolledtext.ScrolledText(root, state='disabled')
+    for tag, (color, _) in sit.LOG_TAGS.items():
+        app.console.tag_configure(tag, foreground=color)
+
+    def burst():
+        for i in range(5000):
+            app.log(f"📡 FIX {i} | IP: 203.0.113.7 | LOCATION: London | TRACKING ACTIVE")
+        while not app.log_queue.empty():
+            app.drain_log()
+        root.update_idletasks()
+
+    try:
+        benchmark.pedantic(burst, rounds=5, iterations=1)
+    finally:
+        root.destroy()
+
+def spiral_history(n):
+    history = sit.TrackHistory(capacity=None)
+    for i in range(n):
+        # Long runs of identical fixes, like real IP geolocation, along a slow spiral
+        k = i // 20
+        r = 0.001 * k
+        history.append(51.5 + r * math.sin(k / 15), -0.12 + r * math.cos(k / 15), 1_700_000_000 + 8 * i)
+    return history
+
+@pytest.mark.parametrize("points", [1_000, 10_000, 100_000])
+def test_simplify(benchmark, points):
+    lats, lons, _ = spiral_history(points).columns()
+    benchmark(sit.TrackSimplifier.simplify, lats, lons)
+
+@pytest.mark.parametrize("points", [1_000, 10_000, 100_000])
+def test_draw_map(benchmark, tmp_path, points):
+    pytest.importorskip("folium")
+    history = spiral_history(points)
+    out = tmp_path / "trace.html"
+    benchmark.pedantic(sit.LiveMap.export_snapshot, args=(out, history, {"imei": "490154203237518"}),
+                       rounds=3, iterations=1)
+    benchmark.extra_info["html_bytes"] = out.stat().st_size
+
+@pytest.fixture
+def map_server(tmp_path, monkeypatch):
+    (tmp_path / "trace.html").write_text("<p>SIGMA</p>\n" * 20_000)
+    (tmp_path / "track.geojsonl").write_bytes(os.urandom(256 * 1024))
+    monkeypatch.setattr(sigma_map_server.MapRequestHandler, "log_message", lambda *args: None)
+    server = sigma_map_server.MapServer(("127.0.0.1", 0), tmp_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize("path,headers", [
+    ("/trace.html", {"Accept-Encoding": "gzip"}),
+    ("/trace.html", {}),
+    ("/track.geojsonl", {}),
+], ids=["gzip", "identity", "sendfile"])
+def test_http_server_throughput(benchmark, map_server, path, headers):
+    clients, per_client = 8, 25
+    statuses = []  # collected per round: an assert inside client() would only kill its thread
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", map_server)
+        try:
+            for _ in range(per_client):
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                statuses.append(resp.status)
+        except (OSError, http.client.HTTPException) as e:
+            statuses.append(repr(e))
+        finally:
+            conn.close()
+
+    def storm():
+        statuses.clear()
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # storm() runs on the test's own thread, so this fails the test for any round
+        assert statuses == [200] * (clients * per_client)
+
+    benchmark.pedantic(storm, rounds=5, iterations=1)
+    benchmark.extra_info["requests_per_round"] = clients * per_client
@@ -0,0 +1,141 @@
+"""Local stand-ins for the geolocation providers used by GPSTracker.
+
+Each route answers in the same JSON shape as the real service, with configurable
+latency, error rate and "hang" rate (requests that outlive the client timeout):
+
+    with FakeProviders(ipapi_co={"latency": 0.5, "error_rate": 0.2}) as fake:
+        gps = GPSTracker(urls=fake.urls())
+
+Run standalone to poke at it by hand:
+
+    python benchmarks/fake_providers.py --latency 0.3 --error-rate 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIX = {"ip": "203.0.113.7", "lat": 51.5074, "lon": -0.1278, "city": "London",
+       "country": "United Kingdom", "country_code": "GB", "org": "AS64500 Example Net"}
+
+ROUTES = {
+    "/ipapi_co/json/": "ipapi_co",
+    "/ipinfo_io/json": "ipinfo_io",
+    "/abstract_api/v1/": "abstract_api",
+    "/ip_check": "ip_check"
+}
+
+def payload(name, fix=FIX):
+    if name == "ipapi_co":
+        return {"ip": fix["ip"], "latitude": fix["lat"], "longitude": fix["lon"], "city": fix["city"],
+                "country_name": fix["country"], "org": fix["org"]}
+    if name == "ipinfo_io":
+        return {"ip": fix["ip"], "loc": f"{fix['lat']},{fix['lon']}", "city": fix["city"],
+                "country": fix["country_code"], "org": fix["org"]}
+    if name == "abstract_api":
+        return {"ip_address": fix["ip"], "latitude": fix["lat"], "longitude": fix["lon"],
+                "city": fix["city"], "country": fix["country"],
+                "connection": {"organization_name": fix["org"]}}
+    return {"ip": fix["ip"]}
+
+class ProviderBehaviour:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, hang_rate=0.0, hang_for=30.0,
+                 status=503):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_for = hang_for
+        self.status = status
+        self.requests = 0
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        name = ROUTES.get(urlsplit(self.path).path)
+        if name is None:
+            self.send_error(404)
+            return
+        behaviour = self.server.behaviours[name]
+        behaviour.requests += 1
+        roll = random.random()
+        if roll < behaviour.hang_rate:
+            time.sleep(behaviour.hang_for)
+        delay = behaviour.latency + random.uniform(0, behaviour.jitter)
+        if delay:
+            time.sleep(delay)
+        if roll >= behaviour.hang_rate and random.random() < behaviour.error_rate:
+            body = b'{"error": "fake failure"}'
+            self.send_response(behaviour.status)
+        else:
+            body = json.dumps(payload(name)).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeProviders:
+    """Threaded local server hosting every provider route on one port"""
+    def __init__(self, host="127.0.0.1", port=0, **behaviours):
+        self.server = ThreadingHTTPServer((host, port), FakeProviderHandler)
+        self.server.daemon_threads = True
+        self.server.behaviours = {name: ProviderBehaviour(**behaviours.get(name, {}))
+                                  for name in ROUTES.values()}
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def behaviour(self, name):
+        return self.server.behaviours[name]
+
+    def urls(self):
+        """URL overrides for GPSTracker(urls=...)"""
+        return {name: self.base_url + path for path, name in ROUTES.items()}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake geolocation providers locally")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    behaviour = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+                 "hang_rate": args.hang_rate}
+    fake = FakeProviders(port=args.port, **{name: behaviour for name in ROUTES.values()})
+    for name, url in fake.urls().items():
+        print(f"{name}: {url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,109 @@
-import tkinter as tk
-from tkinter import scrolledtext
-import folium
-import requests
-import geocoder
-import webbrowser
+import importlib
+import sys
+from urllib.parse import urlsplit
 import threading
 import os, time, datetime
 from pathlib import Path
-from http.server import SimpleHTTPRequestHandler
-import socketserver
-import phonenumbers
-from phonenumbers import carrier, geocoder as phone_geocoder
+import zlib
+import shutil
 import random
 import socket
 import re
-from tkinter import messagebox
+import json
+import cProfile
+import tracemalloc
+import argparse
+import csv
+import tempfile
+import math
+import bisect
+import ipaddress
+import mmap
+import struct
+from array import array
+import queue
+import logging
+from logging.handlers import RotatingFileHandler
+from collections import OrderedDict, Counter, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # Config
 REFRESH = 8
+REFRESH_MAX = REFRESH * 8  # ceiling for the adaptive refresh interval (seconds)
+REFRESH_BACKOFF = 1.5  # interval multiplier while the fix is stable or providers throttle
+REFRESH_STABLE_TICKS = 3  # unchanged fixes in a row before the interval starts stretching
 PORT = 5055
-SAVE_DIR = Path.home() / ".sigma_tracker"
-SAVE_DIR.mkdir(exist_ok=True)
+MAP_HOST = "127.0.0.1"  # the map server only listens locally
+SAVE_DIR = Path.home() / ".sigma_tracker"  # created on first use, not at import
 MAP_FILE = SAVE_DIR / "trace.html"
+TRACK_FILE = SAVE_DIR / "track.geojsonl"  # one GeoJSON Feature per line, appended live
+PROVIDER_TIMEOUT = 5  # per-request timeout (seconds)
+LOOKUP_DEADLINE = 6  # overall budget for one concurrent refresh (seconds)
+IP_CHECK_TIMEOUT = 1  # the public-IP probe gets at most this much of LOOKUP_DEADLINE (seconds)
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+POOL_SIZE = 4  # keep-alive connections per provider host
+HTTP_RETRIES = 1
+HTTP_BACKOFF = 0.3
+GEO_CACHE_FILE = SAVE_DIR / "geo_cache.json"
+GEO_CACHE_SIZE = 1024  # max cached IPs (LRU eviction)
+GEO_CACHE_TTL = 3600  # seconds before a cached fix is looked up again
+GEO_CACHE_SAVE_INTERVAL = 30  # min seconds between cache writes
+IP_DB_SOURCE = SAVE_DIR / "ip_ranges.csv"  # optional offline range database (CSV)
+IP_DB_FILE = SAVE_DIR / "ip_ranges.idx"  # compiled, memory-mapped form of IP_DB_SOURCE
+IP_DB_MMDB = SAVE_DIR / "ip_ranges.mmdb"  # used instead when present and maxminddb is installed
+IP_DB_MAGIC = b"SIGIPDB1"
+IP_DB_VERSION = 1
+# magic, version, ranges, locations, strings, blob bytes; 32 bytes keeps the float64 columns aligned
+IP_DB_HEADER = struct.Struct("<8sIIIIQ")
+IP_DB_ACCURACY = 25  # km reported when a range carries no accuracy radius
+HEALTH_WINDOW = 50  # latency samples kept per provider
+BREAKER_THRESHOLD = 3  # consecutive failures before a provider is skipped
+BREAKER_COOLDOWN = 60  # seconds a tripped provider stays skipped
+IP_CHECK_URL = "https://api.ipify.org?format=json"
+# Provider endpoints; override per GPSTracker (e.g. to point at local stand-ins)
+PROVIDER_URLS = {
+    "ipapi_co": "https://ipapi.co/json/",
+    "ipinfo_io": "https://ipinfo.io/json",
+    "abstract_api": "https://ipgeolocation.abstractapi.com/v1/?api_key=d4e8b4d0c7e14d5c8a61d2d7b4c1e1a0",
+    "ip_check": IP_CHECK_URL
+}
+
+HISTORY_MAX_POINTS = 200000  # ring-buffer cap for track history (None = unbounded)
+HISTORY_FILE = SAVE_DIR / "history.bin"  # append-only journal of fixes
+JOURNAL_MAGIC = b"SIGHIST1"
+JOURNAL_RECORD = struct.Struct("<ddd")  # timestamp, lat, lon
+JOURNAL_FSYNC_INTERVAL = 5  # seconds between batched flush + fsync
+EXPORT_CHUNK_ROWS = 65536  # fixes per chunk when streaming history exports/imports
+COLUMNAR_MAGIC = b"SIGCOL01"
+COLUMNAR_VERSION = 1
+# magic, version, column count, rows; padded to 32 bytes so the float64 columns stay aligned
+COLUMNAR_HEADER = struct.Struct("<8sIIQ8x")
+MAP_ZOOM = 12
+MAP_TOLERANCE_PX = 2  # polyline simplification tolerance in screen pixels at MAP_ZOOM
+MAP_MAX_MARKERS = 500  # historical markers kept after clustering
+MAP_POLL_MS = REFRESH * 1000  # how often the map page re-reads TRACK_FILE
+GZIP_MIN_SIZE = 1024  # smaller responses are sent as-is
+GZIP_CACHE_ENTRIES = 32  # compressed bodies kept in memory
+SENDFILE_MIN_SIZE = 64 * 1024  # uncompressed bodies at least this big go through sendfile()
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/geo+json")
+SSE_PATH = "/events"  # Server-Sent Events stream of new fixes
+MAP_SHELL_MARKER = "sigma-map-shell"  # HTML comment naming the feed-script version a shell was built with
+SSE_CLIENT_BACKLOG = 256  # queued messages per client before the oldest are dropped
+SSE_KEEPALIVE = 15  # seconds between comment pings on an idle stream
+CARRIER_CACHE_SIZE = 4096  # memoized carrier/region lookups (LRU)
+CARRIER_PREFIX_LEN = 9  # "+" + country code + leading national digits used as the memo key
+VALIDATE_CHUNK_ROWS = 65536  # rows validated per batch when streaming inventory files
+METRICS_PATH = "/metrics"  # Prometheus text exposition on the map server
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PROFILE_TOP = 40  # tracemalloc allocation sites kept in a profiling report
+IMPORT_BUDGET_MS = 150  # cold `import sigma_imei_tracking` must stay under this
+LOG_FLUSH_MS = 50  # console drain interval
+LOG_BATCH_MAX = 500  # max lines inserted into the console per drain
+CONSOLE_MAX_LINES = 5000  # scrollback kept in the console widget
+CONSOLE_TRIM_CHUNK = 1000  # lines trimmed at once when the limit is exceeded
+CONSOLE_SPILL_FILE = SAVE_DIR / "console.log"  # trimmed scrollback ends up here
+CONSOLE_SPILL_BYTES = 5 * 1024 * 1024
+CONSOLE_SPILL_BACKUPS = 3
 
 # Hacker-themed colors
 BG_COLOR = "#0a0a0a"
@@ -32,98 +113,1103 @@ SECONDARY_COLOR = "#00ffff"
 TERMINAL_FONT = ("Courier", 12)
 TITLE_FONT = ("Courier", 20, "bold")
 
-class GPSTracker:
+# Simulated carrier -> IP range table, checked in order against the lower-cased carrier name
+CARRIER_IP_RANGES = (
+    ("vodafone", "87.194.0.0/16"),
+    ("verizon", "71.160.0.0/16"),
+    ("att", "99.110.0.0/16")
+)
+# Simulated TAC prefix -> country calling code
+TAC_COUNTRY_CODES = {"01": "1", "86": "86"}
+
+class LazyModule:
+    """Module proxy that performs the real import on first attribute access"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+# Heavy dependencies are only imported by the code paths that need them
+tk = LazyModule("tkinter")
+scrolledtext = LazyModule("tkinter.scrolledtext")
+messagebox = LazyModule("tkinter.messagebox")
+folium = LazyModule("folium")
+requests = LazyModule("requests")
+requests_adapters = LazyModule("requests.adapters")
+urllib3_retry = LazyModule("urllib3.util.retry")
+geocoder = LazyModule("geocoder")
+phonenumbers = LazyModule("phonenumbers")
+carrier = LazyModule("phonenumbers.carrier")
+phone_geocoder = LazyModule("phonenumbers.geocoder")
+# Stdlib modules that cost several ms each and only serve one command or code path
+subprocess = LazyModule("subprocess")
+webbrowser = LazyModule("webbrowser")
+pstats = LazyModule("pstats")
+ElementTree = LazyModule("xml.etree.ElementTree")
+saxutils = LazyModule("xml.sax.saxutils")
+
+def optional_import(name):
+    """Import an optional dependency, or return None when it isn't installed"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+def ensure_dir(path):
+    Path(path).mkdir(parents=True, exist_ok=True)
+
+def measure_import_time(module="sigma_imei_tracking", runs=3):
+    """Best-of-N cumulative import time in ms, as reported by `python -X importtime`"""
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              capture_output=True, text=True,
+                              cwd=str(Path(__file__).resolve().parent))
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+        for line in proc.stderr.splitlines():
+            parts = [p.strip() for p in line.split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                ms = int(parts[1]) / 1000.0
+                best = ms if best is None else min(best, ms)
+    return best
+
+def check_import_budget(budget_ms=IMPORT_BUDGET_MS):
+    """Regression check for startup cost; returns (ok, measured_ms)"""
+    ms = measure_import_time()
+    return ms is not None and ms <= budget_ms, ms
+
+# Console keyword highlighting: tag -> (color, keywords)
+LOG_TAGS = {
+    "success": ("#0f0", ["ACTIVATED", "TRACKING", "SUCCESS", "READY"]),
+    "warning": ("#ff0", ["WARNING", "CAUTION", "ATTENTION"]),
+    "error": ("#f00", ["ERROR", "FAILED", "TERMINATED"]),
+    "info": ("#0ff", ["LOCATION", "IP", "COORDINATES"])
+}
+LOG_KEYWORD_TAG = {word: tag for tag, (_, words) in LOG_TAGS.items() for word in words}
+LOG_KEYWORD_RE = re.compile("|".join(sorted(map(re.escape, LOG_KEYWORD_TAG), key=len, reverse=True)))
+
+class MetricCounter:
+    """Monotonic counter with optional labels"""
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value)
+                    for key, value in self._values.items()]
+
+class MetricHistogram:
+    """Cumulative-bucket histogram with sum and count, Prometheus style"""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels):
+        return _MetricTimer(self, labels)
+
+    def mean(self, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return series[-2] / series[-1] if series and series[-1] else None
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            labels = dict(zip(self.labelnames, key))
+            running = 0
+            for bound, count in zip(self.buckets, series):
+                running += count
+                out.append((self.name + "_bucket", dict(labels, le=repr(float(bound))), running))
+            out.append((self.name + "_bucket", dict(labels, le="+Inf"), series[-1]))
+            out.append((self.name + "_sum", labels, series[-2]))
+            out.append((self.name + "_count", labels, series[-1]))
+        return out
+
+class _MetricTimer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.monotonic() - self.start, **self.labels)
+
+class MetricGauge:
+    """Value read at scrape time from a callback (number or {labels-tuple: number})"""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labelnames=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, dict(zip(self.labelnames, key if isinstance(key, tuple) else (key,))), v)
+                    for key, v in value.items()]
+        return [] if value is None else [(self.name, {}, value)]
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text format"""
     def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, MetricGauge):
+                return existing
+            # Callback gauges are re-bound to the latest owner (e.g. a new engine)
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(MetricCounter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(MetricHistogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, fn, labelnames=(), kind="gauge"):
+        return self._register(MetricGauge(name, help, fn, labelnames, kind))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @classmethod
+    def _labels(cls, labels):
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{k}="{cls._escape(v)}"' for k, v in labels.items()) + "}"
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                # Full precision: a rounded counter (1.23457e+06) breaks rate() on long runs
+                lines.append(f"{name}{self._labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+PROVIDER_LATENCY = METRICS.histogram("sigma_provider_latency_seconds",
+                                     "Geolocation provider call latency", ("provider", "outcome"))
+REFRESH_SECONDS = METRICS.histogram("sigma_refresh_seconds", "Duration of one tracking refresh")
+REFRESH_OVERRUNS = METRICS.counter("sigma_refresh_overruns_total", "Refresh ticks skipped because a refresh overran")
+MAP_RENDER_SECONDS = METRICS.histogram("sigma_map_render_seconds", "Map generation time", ("kind",))
+HTTP_REQUESTS = METRICS.counter("sigma_http_requests_total", "Map server requests", ("code",))
+HTTP_SECONDS = METRICS.histogram("sigma_http_request_seconds", "Map server response time (excluding streams)")
+
+class ProfileCapture:
+    """Opt-in cProfile + tracemalloc capture of the tracking hot paths.
+
+    Calls routed through run() are profiled while the capture is active, from any
+    thread: the tracking loop and the provider pool each get their own Profile per
+    call, merged into one pstats.Stats. stop() writes a .pstats file and a tracemalloc
+    top-allocations report to `out_dir`.
+    """
+    def __init__(self, out_dir=SAVE_DIR):
+        self.out_dir = Path(out_dir)
+        self.active = False
+        self._stats = None  # pstats.Stats merged from every finished call
+        self._lock = threading.Lock()
+        self._local = threading.local()  # marks threads already inside run()
+
+    def start(self):
+        if self.active:
+            return False
+        self._stats = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        self.active = True
+        return True
+
+    def run(self, fn, *args, **kwargs):
+        if not self.active or getattr(self._local, "busy", False):
+            # Nested calls are already covered by the enclosing profile
+            return fn(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ profiles through sys.monitoring: the enclosing profile on
+            # another thread already sees this one
+            return fn(*args, **kwargs)
+        self._local.busy = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._local.busy = False
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def stop(self):
+        """Stop capturing; returns (pstats path, tracemalloc report path)"""
+        if not self.active:
+            return None
+        self.active = False
+        ensure_dir(self.out_dir)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        stats_path = self.out_dir / f"profile-{stamp}.pstats"
+        mem_path = self.out_dir / f"tracemalloc-{stamp}.txt"
+        with self._lock:
+            stats, self._stats = self._stats, None
+        if stats is None:
+            cProfile.Profile().dump_stats(str(stats_path))
+        else:
+            stats.dump_stats(str(stats_path))
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        with open(mem_path, "w", encoding="utf-8") as f:
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+                f.write(f"{stat}\n")
+        return stats_path, mem_path
+
+class ProviderTransport:
+    """Shared HTTP layer: one pooled keep-alive session per provider host"""
+    def __init__(self, pool_size=POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF,
+                 timeout=PROVIDER_TIMEOUT, user_agent=USER_AGENT):
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self._sessions = {}
+        self._lock = threading.Lock()
+    
+    def _make_session(self):
+        retry = urllib3_retry.Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=0,  # a provider that timed out once would just eat another full timeout
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False
+        )
+        adapter = requests_adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                              max_retries=retry, pool_block=False)
+        session = requests.Session()
+        session.headers.update({"User-Agent": self.user_agent, "Connection": "keep-alive"})
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def session_for(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._make_session()
+            return session
+    
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session_for(url).get(url, **kwargs)
+    
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+class GeoCache:
+    """Geolocation results keyed by IP, with per-entry TTL, LRU eviction and disk persistence"""
+    def __init__(self, path=GEO_CACHE_FILE, max_entries=GEO_CACHE_SIZE, ttl=GEO_CACHE_TTL,
+                 save_interval=GEO_CACHE_SAVE_INTERVAL):
+        self.path = Path(path) if path else None
+        if self.path:
+            ensure_dir(self.path.parent)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # ip -> (expires_at, info)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self.load()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, ip):
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, info = entry
+            if expires_at < time.time():
+                del self._entries[ip]
+                self._dirty = True
+                self.misses += 1
+                return None
+            self._entries.move_to_end(ip)
+            self.hits += 1
+            return dict(info)
+    
+    def put(self, ip, info, ttl=None):
+        if not ip or ip == "Unknown":
+            return
+        with self._lock:
+            self._entries[ip] = (time.time() + (self.ttl if ttl is None else ttl), dict(info))
+            self._entries.move_to_end(ip)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+    
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0
+        }
+    
+    def load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            # File is written oldest-first, so insertion order restores the LRU order
+            for ip, expires_at, info in raw.get("entries", []):
+                if expires_at > now:
+                    self._entries[ip] = (expires_at, info)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {"entries": [[ip, exp, info] for ip, (exp, info) in self._entries.items()]}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            self._dirty = True
+
+class IPRangeDB:
+    """Offline IPv4 geolocation from a compiled, memory-mapped range index.
+
+    compile() turns a CSV of ranges into sorted uint32 start/end columns plus a
+    deduplicated location table; lookup() bisects the mapped starts, so a hit costs
+    microseconds and needs no network.
+    """
+    # Accepted CSV headers (lower-cased) for each field
+    COLUMNS = {
+        "network": ("network", "cidr"),
+        "start": ("start", "start_ip", "ip_start", "ip_from", "range_start"),
+        "end": ("end", "end_ip", "ip_end", "ip_to", "range_end"),
+        "lat": ("lat", "latitude"),
+        "lon": ("lon", "lng", "longitude"),
+        "city": ("city", "city_name"),
+        "country": ("country", "country_name", "country_code"),
+        "org": ("org", "organization", "isp", "autonomous_system_organization"),
+        "accuracy": ("accuracy", "accuracy_radius")
+    }
+
+    def __init__(self, path=IP_DB_FILE):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            if len(self._mmap) < IP_DB_HEADER.size:
+                raise ValueError(f"{self.path}: not a compiled IP range database")
+            magic, version, ranges, locations, strings, blob = IP_DB_HEADER.unpack_from(self._mmap)
+            if magic != IP_DB_MAGIC:
+                raise ValueError(f"{self.path}: not a compiled IP range database")
+            if version != IP_DB_VERSION:
+                raise ValueError(f"{self.path}: unsupported database version {version}")
+            expected = IP_DB_HEADER.size + 16 * locations + 12 * ranges + 16 * locations + 4 * (strings + 1) + blob
+            if len(self._mmap) < expected:
+                raise ValueError(f"{self.path}: truncated")
+            self._offset = IP_DB_HEADER.size
+            self._lats = self._column('d', locations)
+            self._lons = self._column('d', locations)
+            self._starts = self._column('I', ranges)
+            self._ends = self._column('I', ranges)
+            self._locs = self._column('I', ranges)
+            self._fields = self._column('I', 4 * locations)  # city, country, org string ids + accuracy
+            self._string_offsets = self._column('I', strings + 1)
+            self._blob = self._column('B', blob)
+        except Exception:
+            self.close()
+            raise
+
+    def _column(self, fmt, count):
+        size = count * struct.calcsize(fmt)
+        raw = memoryview(self._mmap)[self._offset:self._offset + size]
+        view = raw.cast(fmt)
+        self._views += [raw, view]
+        self._offset += size
+        return view
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _string(self, idx):
+        return bytes(self._blob[self._string_offsets[idx]:self._string_offsets[idx + 1]]).decode("utf-8")
+
+    def lookup(self, ip):
+        """Location dict for an IPv4 address, or None when no range covers it"""
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if addr.version != 4:
+            return None
+        key = int(addr)
+        i = bisect.bisect_right(self._starts, key) - 1
+        if i < 0 or key > self._ends[i]:
+            return None
+        loc = self._locs[i]
+        city, country, org, accuracy = self._fields[4 * loc:4 * loc + 4]
+        return {
+            "lat": self._lats[loc],
+            "lon": self._lons[loc],
+            "city": self._string(city) or "Unknown",
+            "country": self._string(country) or "Unknown",
+            "org": self._string(org) or "Unknown",
+            "ip": str(addr),
+            "accuracy": accuracy
+        }
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    @classmethod
+    def _field(cls, row, name):
+        for key in cls.COLUMNS[name]:
+            value = row.get(key)
+            if value not in (None, ""):
+                return value.strip()
+        return ""
+
+    @staticmethod
+    def _ip_int(value):
+        return int(value) if value.isdigit() else int(ipaddress.IPv4Address(value))
+
+    @classmethod
+    def _parse_range(cls, row):
+        network = cls._field(row, "network")
+        if network:
+            net = ipaddress.ip_network(network, strict=False)
+            if net.version != 4:
+                return None
+            return int(net.network_address), int(net.broadcast_address)
+        start, end = cls._field(row, "start"), cls._field(row, "end")
+        if not start:
+            return None
+        try:
+            span = cls._ip_int(start), cls._ip_int(end or start)
+        except ipaddress.AddressValueError:
+            return None  # IPv6 rows; the index is IPv4-only
+        return span if span[1] <= 0xFFFFFFFF else None
+
+    @classmethod
+    def compile(cls, source=IP_DB_SOURCE, dest=IP_DB_FILE):
+        """Compile a CSV of ranges into the binary index; returns a summary dict.
+
+        Rows need a CIDR `network` column or `start`/`end` addresses (dotted or
+        integer) plus latitude/longitude; city, country, org and accuracy are optional.
+        Overlapping ranges keep the one that starts first.
+        """
+        starts, ends, locs = array('I'), array('I'), array('I')
+        locations, strings = {}, {"": 0}
+        skipped = 0
+        with open(source, newline="", encoding="utf-8", errors="replace") as f:
+            reader = csv.DictReader(f)
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+            for row in reader:
+                try:
+                    span = cls._parse_range(row)
+                    lat, lon = float(cls._field(row, "lat")), float(cls._field(row, "lon"))
+                    accuracy = int(float(cls._field(row, "accuracy") or IP_DB_ACCURACY))
+                except ValueError:
+                    span = None
+                if span is None or span[0] > span[1]:
+                    skipped += 1
+                    continue
+                ids = tuple(strings.setdefault(cls._field(row, name), len(strings))
+                            for name in ("city", "country", "org"))
+                loc = locations.setdefault((lat, lon) + ids + (accuracy,), len(locations))
+                starts.append(span[0])
+                ends.append(span[1])
+                locs.append(loc)
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        sorted_starts, sorted_ends, sorted_locs = array('I'), array('I'), array('I')
+        for i in order:
+            if sorted_ends and starts[i] <= sorted_ends[-1]:
+                skipped += 1
+                continue
+            sorted_starts.append(starts[i])
+            sorted_ends.append(ends[i])
+            sorted_locs.append(locs[i])
+        lats, lons, fields = array('d'), array('d'), array('I')
+        for lat, lon, city, country, org, accuracy in locations:  # dicts keep insertion (= id) order
+            lats.append(lat)
+            lons.append(lon)
+            fields.extend((city, country, org, accuracy))
+        offsets, blob = array('I', [0]), bytearray()
+        for text in strings:
+            blob += text.encode("utf-8")
+            offsets.append(len(blob))
+        dest = Path(dest)
+        ensure_dir(dest.parent)
+        tmp = dest.with_name(dest.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(IP_DB_HEADER.pack(IP_DB_MAGIC, IP_DB_VERSION, len(sorted_starts), len(locations),
+                                      len(strings), len(blob)))
+            for column in (lats, lons, sorted_starts, sorted_ends, sorted_locs, fields, offsets):
+                f.write(column)
+            f.write(blob)
+        os.replace(tmp, dest)
+        return {"ranges": len(sorted_starts), "locations": len(locations), "skipped": skipped,
+                "path": str(dest)}
+
+    @classmethod
+    def load(cls, directory=SAVE_DIR):
+        """Open the already-compiled offline database in `directory`, if any.
+
+        Never compiles (that can take minutes for a large CSV, see is_stale()); without
+        an index, an .mmdb file is used when the maxminddb package is installed.
+        """
+        directory = Path(directory)
+        compiled = directory / IP_DB_FILE.name
+        if compiled.exists():
+            return cls(compiled)
+        mmdb = directory / IP_DB_MMDB.name
+        if mmdb.exists():
+            return MMDBRangeDB(mmdb)
+        return None
+
+    @staticmethod
+    def is_stale(directory=SAVE_DIR):
+        """True when ip_ranges.csv in `directory` is newer than its compiled index"""
+        directory = Path(directory)
+        source, compiled = directory / IP_DB_SOURCE.name, directory / IP_DB_FILE.name
+        return source.exists() and (not compiled.exists() or
+                                    compiled.stat().st_mtime < source.stat().st_mtime)
+
+class MMDBRangeDB:
+    """IPRangeDB-compatible lookups from a MaxMind-format .mmdb (needs the maxminddb package).
+
+    The maxminddb reader memory-maps the file and walks its search tree, so it is
+    used as-is instead of being compiled.
+    """
+    def __init__(self, path=IP_DB_MMDB):
+        maxminddb = optional_import("maxminddb")
+        if maxminddb is None:
+            raise RuntimeError("reading .mmdb files needs the maxminddb package")
+        self.path = Path(path)
+        self._reader = maxminddb.open_database(str(self.path), maxminddb.MODE_MMAP)
+
+    def lookup(self, ip):
+        try:
+            record = self._reader.get(ip)
+        except ValueError:
+            return None
+        location = (record or {}).get("location") or {}
+        if "latitude" not in location:
+            return None
+
+        def name(key):
+            return ((record.get(key) or {}).get("names") or {}).get("en") or "Unknown"
+        return {
+            "lat": float(location["latitude"]),
+            "lon": float(location["longitude"]),
+            "city": name("city"),
+            "country": name("country"),
+            "org": record.get("autonomous_system_organization", "Unknown"),
+            "ip": ip,
+            "accuracy": location.get("accuracy_radius", IP_DB_ACCURACY)
+        }
+
+    def close(self):
+        self._reader.close()
+
+class ProviderError(Exception):
+    """A provider answered, but not with a usable location"""
+    def __init__(self, msg, status=None):
+        super().__init__(msg)
+        self.status = status
+
+class ProviderHealth:
+    """Rolling latency/error statistics and circuit breaker for one provider"""
+    def __init__(self, window=HEALTH_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.status_counts = Counter()
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trips = 0
+        self.last_error = None
+        self.throttled_at = 0.0  # monotonic time of the last HTTP 429
+    
+    def percentile(self, pct):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+    
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+    
+    @property
+    def is_open(self):
+        return self.open_until > time.monotonic()
+    
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "status": dict(self.status_counts),
+            "breaker": "open" if self.is_open else "closed",
+            "trips": self.trips,
+            "last_error": self.last_error
+        }
+
+class HealthBoard:
+    """Scoreboard used to order providers and skip the ones that keep failing"""
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, window=HEALTH_WINDOW):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.window = window
+        self._stats = {}
+        self._lock = threading.Lock()
+    
+    def _get(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = ProviderHealth(self.window)
+        return stats
+    
+    def record(self, name, latency, ok, status=None, error=None):
+        with self._lock:
+            stats = self._get(name)
+            stats.calls += 1
+            stats.latencies.append(latency)
+            stats.outcomes.append(1 if ok else 0)
+            if status is not None:
+                stats.status_counts[status] += 1
+            if status == 429:
+                stats.throttled_at = time.monotonic()
+            if ok:
+                stats.consecutive_failures = 0
+                stats.open_until = 0.0
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.last_error = str(error) if error is not None else None
+            if stats.consecutive_failures >= self.threshold:
+                # Half-open after the cool-down: one more failure re-trips immediately
+                stats.open_until = time.monotonic() + self.cooldown
+                stats.consecutive_failures = self.threshold - 1
+                stats.trips += 1
+    
+    def ordered(self, services, name_of):
+        """Healthy providers, fastest first; tripped ones are left out until their cool-down ends"""
+        with self._lock:
+            ranked = []
+            for idx, service in enumerate(services):
+                stats = self._get(name_of(service))
+                if stats.is_open:
+                    continue
+                p50 = stats.percentile(50)
+                # Unmeasured providers go first so they get a latency sample
+                ranked.append((stats.error_rate >= 0.5, p50 if p50 is not None else 0.0, idx, service))
+        ranked.sort(key=lambda item: item[:3])
+        return [item[3] for item in ranked]
+    
+    def is_open(self, name):
+        """True while `name`'s breaker is tripped"""
+        with self._lock:
+            return self._get(name).is_open
+    
+    def throttled_since(self, since):
+        """True if any provider answered HTTP 429 after monotonic time `since`"""
+        with self._lock:
+            return any(stats.throttled_at > since for stats in self._stats.values())
+    
+    def snapshot(self):
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in self._stats.items()}
+
+class GPSTracker:
+    def __init__(self, concurrent=True, strategy="first", deadline=LOOKUP_DEADLINE, transport=None,
+                 cache=None, urls=None, ip_db=None, profiler=None):
         self.status = "GLOBAL TRACKING ACTIVE"
+        self.transport = transport or ProviderTransport()
+        self.cache = cache
+        self.urls = dict(PROVIDER_URLS, **(urls or {}))
+        self.health = HealthBoard()
+        self.ip_db = ip_db  # offline IPRangeDB/MMDBRangeDB, consulted before any network provider
+        self.profiler = profiler  # ProfileCapture; provider calls run in pool threads it must see
+        self._lookup_ip = None  # public IP already fetched by get_location() for this lookup
         self.services = [
             self._ipapi_co,
             self._ipinfo_io,
             self._geocoder_ip,
             self._abstract_api
         ]
+        if ip_db is not None:
+            self.services.insert(0, self._local_db)
+        self.concurrent = concurrent
+        self.strategy = strategy  # "first" valid answer or "best" accuracy
+        self.deadline = deadline
+        # Sized so stragglers from a previous refresh don't starve the next one
+        self._pool = ThreadPoolExecutor(max_workers=len(self.services) * 2,
+                                        thread_name_prefix="sigma-provider")
+        self._inflight = {}  # provider name -> future of its latest call
+        self._inflight_lock = threading.Lock()
+        self._race_end = None  # monotonic deadline of the latest race; caps request timeouts
+    
+    def _timeout(self):
+        """Per-request timeout, capped at what is left of the current race deadline"""
+        if self._race_end is None:
+            return self.transport.timeout
+        return max(0.05, min(self.transport.timeout, self._race_end - time.monotonic()))
+    
+    def close(self):
+        """Drop queued provider calls and close pooled connections; running calls end at their timeout"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.transport.close()
+    
+    def _get_json(self, url):
+        r = self.transport.get(url, timeout=self._timeout())
+        if r.status_code != 200:
+            raise ProviderError(f"HTTP {r.status_code}", status=r.status_code)
+        return r.json()
+    
+    def use_ip_db(self, ip_db):
+        """Switch to a (re)compiled offline database, making it the first provider"""
+        self.ip_db = ip_db
+        if self._local_db not in self.services:
+            self.services.insert(0, self._local_db)
+    
+    def _local_db(self):
+        # Never probes: only reached with the IP get_location() already fetched
+        ip = self._lookup_ip
+        if not ip:
+            raise ProviderError("local_db: public IP unknown")
+        result = self.ip_db.lookup(ip)
+        if result is None:
+            raise ProviderError(f"local_db: no range covers {ip}")
+        return result
     
     def _ipapi_co(self):
-        try:
-            r = requests.get("https://ipapi.co/json/", headers={"User-Agent": USER_AGENT}, timeout=5)
-            if r.status_code == 200:
-                data = r.json()
-                return {
-                    "lat": float(data.get("latitude", 0)),
-                    "lon": float(data.get("longitude", 0)),
-                    "city": data.get("city", "Unknown"),
-                    "country": data.get("country_name", "Unknown"),
-                    "org": data.get("org", "Unknown"),
-                    "ip": data.get("ip", "Unknown"),
-                    "accuracy": data.get("accuracy", 5)  # km accuracy
-                }
-        except:
-            pass
-        return None
+        data = self._get_json(self.urls["ipapi_co"])
+        return {
+            "lat": float(data.get("latitude", 0)),
+            "lon": float(data.get("longitude", 0)),
+            "city": data.get("city", "Unknown"),
+            "country": data.get("country_name", "Unknown"),
+            "org": data.get("org", "Unknown"),
+            "ip": data.get("ip", "Unknown"),
+            "accuracy": data.get("accuracy", 5)  # km accuracy
+        }
     
     def _ipinfo_io(self):
-        try:
-            r = requests.get("https://ipinfo.io/json", headers={"User-Agent": USER_AGENT}, timeout=5)
-            if r.status_code == 200:
-                data = r.json()
-                loc = data.get("loc", "0,0").split(",")
-                return {
-                    "lat": float(loc[0]),
-                    "lon": float(loc[1]),
-                    "city": data.get("city", "Unknown"),
-                    "country": data.get("country", "Unknown"),
-                    "org": data.get("org", "Unknown"),
-                    "ip": data.get("ip", "Unknown"),
-                    "accuracy": 10  # default accuracy
-                }
-        except:
-            pass
-        return None
+        data = self._get_json(self.urls["ipinfo_io"])
+        loc = data.get("loc", "0,0").split(",")
+        return {
+            "lat": float(loc[0]),
+            "lon": float(loc[1]),
+            "city": data.get("city", "Unknown"),
+            "country": data.get("country", "Unknown"),
+            "org": data.get("org", "Unknown"),
+            "ip": data.get("ip", "Unknown"),
+            "accuracy": 10  # default accuracy
+        }
     
     def _geocoder_ip(self):
-        try:
-            g = geocoder.ip('me')
-            if g.ok:
-                return {
-                    "lat": g.latlng[0],
-                    "lon": g.latlng[1],
-                    "city": g.city,
-                    "country": g.country,
-                    "org": g.org if g.org else "Unknown",
-                    "ip": g.ip,
-                    "accuracy": 10
-                }
-        except:
-            pass
-        return None
+        g = geocoder.ip('me', timeout=self._timeout())
+        if not g.ok:
+            raise ProviderError(f"geocoder: {g.status}")
+        return {
+            "lat": g.latlng[0],
+            "lon": g.latlng[1],
+            "city": g.city,
+            "country": g.country,
+            "org": g.org if g.org else "Unknown",
+            "ip": g.ip,
+            "accuracy": 10
+        }
     
     def _abstract_api(self):
+        # This is a fallback service
+        data = self._get_json(self.urls["abstract_api"])
+        return {
+            "lat": float(data.get("latitude", 0)),
+            "lon": float(data.get("longitude", 0)),
+            "city": data.get("city", "Unknown"),
+            "country": data.get("country", "Unknown"),
+            "org": data.get("connection", {}).get("organization_name", "Unknown"),
+            "ip": data.get("ip_address", "Unknown"),
+            "accuracy": data.get("accuracy_radius", 10)
+        }
+    
+    @staticmethod
+    def provider_name(service):
+        return getattr(service, "__name__", repr(service)).strip("_")
+    
+    def _call(self, service):
+        """Run one provider, recording latency, status and errors on the health board"""
+        name = self.provider_name(service)
+        start = time.monotonic()
         try:
-            # This is a fallback service
-            r = requests.get("https://ipgeolocation.abstractapi.com/v1/?api_key=d4e8b4d0c7e14d5c8a61d2d7b4c1e1a0", 
-                            headers={"User-Agent": USER_AGENT}, timeout=5)
-            if r.status_code == 200:
-                data = r.json()
-                return {
-                    "lat": float(data.get("latitude", 0)),
-                    "lon": float(data.get("longitude", 0)),
-                    "city": data.get("city", "Unknown"),
-                    "country": data.get("country", "Unknown"),
-                    "org": data.get("connection", {}).get("organization_name", "Unknown"),
-                    "ip": data.get("ip_address", "Unknown"),
-                    "accuracy": data.get("accuracy_radius", 10)
-                }
-        except:
-            pass
-        return None
+            result = self.profiler.run(service) if self.profiler is not None else service()
+        except Exception as e:
+            elapsed = time.monotonic() - start
+            self.health.record(name, elapsed, False, status=getattr(e, "status", None), error=e)
+            PROVIDER_LATENCY.observe(elapsed, provider=name, outcome="error")
+            return None
+        elapsed = time.monotonic() - start
+        ok = bool(result)
+        self.health.record(name, elapsed, ok, status=200 if ok else None,
+                           error=None if ok else "empty result")
+        PROVIDER_LATENCY.observe(elapsed, provider=name, outcome="ok" if ok else "empty")
+        return result
+    
+    def _ip_check(self):
+        r = self.transport.get(self.urls["ip_check"], timeout=min(IP_CHECK_TIMEOUT, self._timeout()))
+        if r.status_code != 200:
+            raise ProviderError(f"HTTP {r.status_code}", status=r.status_code)
+        return r.json().get("ip")
+    
+    def current_ip(self):
+        """Cheap public-IP check used to decide whether a full lookup is needed.
+
+        Tracked on the health board like a provider, so a dead endpoint is skipped
+        while its breaker is open instead of costing every refresh a timeout.
+        """
+        if self.health.is_open(self.provider_name(self._ip_check)):
+            return None
+        return self._call(self._ip_check)
     
     def get_location(self):
-        """Try multiple services until we get a valid location"""
-        for service in self.services:
-            result = service()
+        """Serve from cache while the public IP is unchanged, otherwise do a full lookup"""
+        if self.cache is None and self.ip_db is None:
+            return self.lookup()
+        # The probe spends from the same deadline as the race that may follow it
+        end = self._race_end = time.monotonic() + self.deadline
+        ip = self.current_ip()
+        if ip and self.cache is not None:
+            cached = self.cache.get(ip)
+            if cached:
+                return cached
+        self._lookup_ip = ip
+        try:
+            result = self.lookup(end)
+        finally:
+            self._lookup_ip = None
+        if self.cache is not None and result["ip"] != "Unknown":
+            self.cache.put(result["ip"], result)
+            if ip and ip != result["ip"]:
+                self.cache.put(ip, result)
+        return result
+    
+    def locate_ip(self, ip):
+        """Geolocate an arbitrary IP, reusing earlier answers for the same address"""
+        if self.ip_db is not None:
+            result = self.ip_db.lookup(ip)
             if result:
                 return result
+        if self.cache is not None:
+            cached = self.cache.get(ip)
+            if cached:
+                return cached
+        g = geocoder.ip(ip)
+        if not g.ok:
+            return None
+        result = {
+            "lat": g.latlng[0],
+            "lon": g.latlng[1],
+            "city": g.city,
+            "country": g.country,
+            # Same schema as the providers: this cache also feeds get_location()
+            "org": g.org if g.org else "Unknown",
+            "ip": ip,
+            "accuracy": 10
+        }
+        if self.cache is not None:
+            self.cache.put(ip, result)
+        return result
+    
+    def lookup(self, end=None):
+        """Try multiple services until we get a valid location (racing until monotonic `end`)"""
+        if self.concurrent:
+            result = self._race_services(end)
+        else:
+            result = self._sequential_services()
+        if result:
+            return result
         
         # Fallback to empty data
+        return self._empty_location()
+    
+    def _candidates(self):
+        """Providers to try, healthiest first; the offline database only when the public IP is known"""
+        services = self.health.ordered(self.services, self.provider_name)
+        if not self._lookup_ip and self._local_db in services:
+            services.remove(self._local_db)
+        return services
+    
+    def _sequential_services(self):
+        """Query providers one by one, healthiest first"""
+        for service in self._candidates():
+            result = self._call(service)
+            if result:
+                return result
+        return None
+    
+    def _race_services(self, end=None):
+        """Start every provider at once and keep the first (or most accurate) answer"""
+        end = self._race_end = end or time.monotonic() + self.deadline
+        services = self._candidates()
+        if self.ip_db is not None and self.strategy != "best" and self._local_db in services:
+            # The offline database answers in microseconds; only race the network when it misses
+            services.remove(self._local_db)
+            result = self._call(self._local_db)
+            if result:
+                return result
+        pending = set()
+        with self._inflight_lock:
+            for service in services:
+                # A provider still answering the previous refresh is joined, not called again,
+                # so hanging providers can't pile up stragglers in the pool
+                name = self.provider_name(service)
+                future = self._inflight.get(name)
+                if future is None or future.done():
+                    future = self._inflight[name] = self._pool.submit(self._call, service)
+                pending.add(future)
+        best = None
+        while pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception:
+                    result = None
+                if not result:
+                    continue
+                if self.strategy != "best":
+                    best = result
+                    break
+                if best is None or self._accuracy(result) < self._accuracy(best):
+                    best = result
+            if best is not None and self.strategy != "best":
+                break
+        # Late providers keep running in the pool; their results are simply ignored
+        for future in pending:
+            future.cancel()
+        return best
+    
+    @staticmethod
+    def _accuracy(result):
+        try:
+            return float(result.get("accuracy", 1000))
+        except (TypeError, ValueError):
+            return 1000.0
+    
+    @staticmethod
+    def _empty_location():
         return {
             "lat": 0.0,
             "lon": 0.0,
@@ -134,39 +1220,1089 @@ class GPSTracker:
             "accuracy": 1000
         }
 
-class IMEITracker:
+class TrackHistory:
+    """Columnar (lat, lon, timestamp) store backed by array('d') with an optional ring cap.
+
+    Slots that are already written are never modified: growing or compacting allocates
+    fresh arrays, so memoryviews handed out by columns()/between() stay valid while
+    the tracking thread keeps appending.
+    """
+    __slots__ = ("capacity", "_lat", "_lon", "_ts", "_start", "_end", "_lock")
+
+    def __init__(self, capacity=HISTORY_MAX_POINTS, initial=1024):
+        self.capacity = capacity
+        size = min(initial, 2 * capacity) if capacity else initial
+        self._lat = self._alloc(size)
+        self._lon = self._alloc(size)
+        self._ts = self._alloc(size)
+        self._start = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
     @staticmethod
-    def get_ip_from_imei(imei):
-        """Convert IMEI to phone number format and lookup carrier IP ranges"""
+    def _alloc(size):
+        return array('d', bytes(8 * size))
+
+    def _grow(self):
+        live = self._end - self._start
+        size = 2 * self.capacity if self.capacity else max(1024, 2 * live)
+        for name in ("_lat", "_lon", "_ts"):
+            old = getattr(self, name)
+            new = self._alloc(size)
+            new[:live] = old[self._start:self._end]
+            setattr(self, name, new)
+        self._start, self._end = 0, live
+
+    def append(self, lat, lon, ts):
+        with self._lock:
+            if self._end == len(self._ts):
+                self._grow()
+            i = self._end
+            self._lat[i] = lat
+            self._lon[i] = lon
+            self._ts[i] = ts
+            self._end = i + 1
+            if self.capacity and self._end - self._start > self.capacity:
+                self._start += 1
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __bool__(self):
+        return self._end > self._start
+
+    def __getitem__(self, idx):
+        with self._lock:
+            n = self._end - self._start
+            if idx < 0:
+                idx += n
+            if not 0 <= idx < n:
+                raise IndexError("history index out of range")
+            i = self._start + idx
+            return (self._lat[i], self._lon[i], self._ts[i])
+
+    def __iter__(self):
+        lat, lon, ts = self.columns()
+        return zip(lat, lon, ts)
+
+    def columns(self, start=0, stop=None):
+        """Zero-copy memoryviews of the lat, lon and timestamp columns"""
+        with self._lock:
+            n = self._end - self._start
+            start, stop, _ = slice(start, stop).indices(n)
+            a, b = self._start + start, self._start + stop
+            return (memoryview(self._lat)[a:b], memoryview(self._lon)[a:b],
+                    memoryview(self._ts)[a:b])
+
+    def between(self, t0=None, t1=None):
+        """Columns for fixes with t0 <= timestamp <= t1 (timestamps are appended in order)"""
+        ts = self.columns()[2]
+        lo = bisect.bisect_left(ts, t0) if t0 is not None else 0
+        hi = bisect.bisect_right(ts, t1) if t1 is not None else len(ts)
+        return self.columns(lo, hi)
+
+    def extend(self, lats, lons, stamps):
+        """Bulk append equal-length columns (used when reloading the journal)"""
+        with self._lock:
+            cols = []
+            for old, new in ((self._lat, lats), (self._lon, lons), (self._ts, stamps)):
+                col = old[self._start:self._end]
+                col.extend(new)
+                if self.capacity and len(col) > self.capacity:
+                    col = col[-self.capacity:]
+                cols.append(col)
+            n = len(cols[2])
+            size = max(2 * self.capacity if self.capacity else 2 * n, 1024)
+            for name, col in zip(("_lat", "_lon", "_ts"), cols):
+                new = self._alloc(size)
+                new[:n] = col
+                setattr(self, name, new)
+            self._start, self._end = 0, n
+
+    def clear(self):
+        with self._lock:
+            self._start = self._end = 0
+
+class HistoryJournal:
+    """Append-only binary journal of fixes under SAVE_DIR.
+
+    Records are fixed-size (timestamp, lat, lon) doubles written in time order, so
+    the file itself is the timestamp index: a time window is found by bisecting the
+    memory-mapped timestamp column without parsing the rest of the file.
+    """
+    def __init__(self, path=HISTORY_FILE, fsync_interval=JOURNAL_FSYNC_INTERVAL):
+        self.path = Path(path)
+        self.fsync_interval = fsync_interval
+        self._pending = []
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = self._open()
+
+    def _open(self):
+        ensure_dir(self.path.parent)
+        f = open(self.path, "a+b")
+        size = f.seek(0, os.SEEK_END)
+        if size < len(JOURNAL_MAGIC):
+            f.truncate(0)
+            f.write(JOURNAL_MAGIC)
+            f.flush()
+        else:
+            # Drop a torn trailing record left behind by a crash mid-write
+            body = size - len(JOURNAL_MAGIC)
+            if body % JOURNAL_RECORD.size:
+                f.truncate(size - body % JOURNAL_RECORD.size)
+        return f
+
+    def append(self, lat, lon, ts):
+        with self._lock:
+            self._pending.append(JOURNAL_RECORD.pack(ts, lat, lon))
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_sync = time.monotonic()
+        if not self._pending or self._file is None:
+            return
+        self._file.write(b"".join(self._pending))
+        self._pending.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def read(self, t0=None, t1=None, limit=None):
+        """Return (lats, lons, stamps) arrays for t0 <= timestamp <= t1, newest `limit` only"""
+        lats, lons, stamps = array('d'), array('d'), array('d')
+        for chunk in self.chunks(t0, t1, limit, chunk_rows=None):
+            lats.extend(chunk[0])
+            lons.extend(chunk[1])
+            stamps.extend(chunk[2])
+        return lats, lons, stamps
+
+    def chunks(self, t0=None, t1=None, limit=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """Yield (lats, lons, stamps) arrays of at most `chunk_rows` fixes from the window"""
+        self.flush()
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            count = (size - len(JOURNAL_MAGIC)) // JOURNAL_RECORD.size
+            if count <= 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:len(JOURNAL_MAGIC)] != JOURNAL_MAGIC:
+                    return
+                body = memoryview(mm)[len(JOURNAL_MAGIC):len(JOURNAL_MAGIC) + count * JOURNAL_RECORD.size]
+                flat = body.cast('d')
+                ts = flat[0::3]
+                try:
+                    lo = bisect.bisect_left(ts, t0) if t0 is not None else 0
+                    hi = bisect.bisect_right(ts, t1) if t1 is not None else count
+                    if limit is not None:
+                        lo = max(lo, hi - limit)
+                    step = chunk_rows or max(hi - lo, 1)
+                    for a in range(lo, hi, step):
+                        window = flat[a * 3:min(a + step, hi) * 3]
+                        chunk = (array('d', window[1::3]), array('d', window[2::3]),
+                                 array('d', window[0::3]))
+                        window.release()
+                        yield chunk
+                finally:
+                    ts.release()
+                    flat.release()
+                    body.release()
+
+    def load_into(self, history, t0=None, t1=None):
+        lats, lons, stamps = self.read(t0, t1, limit=history.capacity)
+        history.extend(lats, lons, stamps)
+        return len(stamps)
+
+class ColumnarTrack:
+    """Memory-mapped reader for the packed columnar export (.sigcol).
+
+    After COLUMNAR_HEADER come three contiguous little-endian float64 columns:
+    timestamps, latitudes, longitudes. Views from columns()/between() are zero-copy
+    and stay valid until close().
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mmap = None
+        self._views = []
         try:
-            # Convert IMEI to E.164 format phone number (simplified)
-            country_code = "44"  # Default to UK
-            if len(imei) >= 15:
-                # Extract potential country code from IMEI TAC
-                tac = imei[:8]
-                # This would normally require a TAC database - we'll simulate
-                country_code = "1" if tac.startswith("01") else "86" if tac.startswith("86") else "44"
-            
-            # Generate a pseudo phone number
-            pseudo_number = f"+{country_code}{imei[-9:]}"
-            
-            # Lookup carrier information
-            phone_number = phonenumbers.parse(pseudo_number, None)
-            carrier_name = carrier.name_for_number(phone_number, "en")
-            country = phone_geocoder.description_for_number(phone_number, "en")
-            
-            # Get carrier IP ranges (simulated)
-            if "vodafone" in carrier_name.lower():
-                return "87.194.0.0/16", carrier_name, country
-            elif "verizon" in carrier_name.lower():
-                return "71.160.0.0/16", carrier_name, country
-            elif "att" in carrier_name.lower():
-                return "99.110.0.0/16", carrier_name, country
+            head = self._file.read(COLUMNAR_HEADER.size)
+            if len(head) < COLUMNAR_HEADER.size:
+                raise ValueError(f"{self.path}: not a columnar track")
+            magic, version, ncols, rows = COLUMNAR_HEADER.unpack(head)
+            if magic != COLUMNAR_MAGIC or ncols != 3:
+                raise ValueError(f"{self.path}: not a columnar track")
+            if version != COLUMNAR_VERSION:
+                raise ValueError(f"{self.path}: unsupported columnar version {version}")
+            if os.fstat(self._file.fileno()).st_size < COLUMNAR_HEADER.size + 24 * rows:
+                raise ValueError(f"{self.path}: truncated ({rows} rows expected)")
+            self.rows = rows
+            if rows:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __len__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _view(self, view):
+        self._views.append(view)
+        return view
+
+    def columns(self, start=0, stop=None):
+        """Zero-copy (lats, lons, stamps) views, in TrackHistory.columns() order"""
+        start, stop, _ = slice(start, stop).indices(self.rows)
+        if not self.rows:
+            empty = memoryview(array('d'))
+            return empty, empty, empty
+        n = self.rows
+        raw = self._view(memoryview(self._mmap))
+        flat = self._view(raw[COLUMNAR_HEADER.size:COLUMNAR_HEADER.size + 24 * n].cast('d'))
+        return (self._view(flat[n + start:n + stop]), self._view(flat[2 * n + start:2 * n + stop]),
+                self._view(flat[start:stop]))
+
+    def between(self, t0=None, t1=None):
+        """Views for fixes with t0 <= timestamp <= t1 (exports are written in time order)"""
+        ts = self.columns()[2]
+        lo = bisect.bisect_left(ts, t0) if t0 is not None else 0
+        hi = bisect.bisect_right(ts, t1) if t1 is not None else len(ts)
+        return self.columns(lo, hi)
+
+    def chunks(self, chunk_rows=EXPORT_CHUNK_ROWS):
+        """Yield copied (lats, lons, stamps) arrays of at most `chunk_rows` fixes"""
+        for a in range(0, self.rows, chunk_rows):
+            lats, lons, stamps = self.columns(a, a + chunk_rows)
+            yield array('d', lats), array('d', lons), array('d', stamps)
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+class TrackExport:
+    """Streaming history export/import: GeoJSON, line-delimited GeoJSON, GPX, CSV, columnar.
+
+    Writers consume an iterable of (lats, lons, stamps) chunks and readers yield the
+    same, so neither side holds a long session in memory (GeoJSON import aside: the
+    stdlib json module has no incremental parser).
+    """
+    FORMATS = {".geojson": "geojson", ".json": "geojson", ".geojsonl": "geojsonl", ".gpx": "gpx",
+               ".csv": "csv", ".sigcol": "columnar"}
+    CSV_FIELDS = ["t", "lat", "lon"]
+    GPX_NS = "http://www.topografix.com/GPX/1/1"
+
+    @classmethod
+    def format_of(cls, path, fmt=None):
+        fmt = fmt or cls.FORMATS.get(Path(path).suffix.lower())
+        if fmt not in cls.FORMATS.values():
+            known = ", ".join(sorted(set(cls.FORMATS.values())))
+            raise ValueError(f"unknown track format for {path} (expected one of: {known})")
+        return fmt
+
+    @staticmethod
+    def iso_time(ts):
+        stamp = datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+        return stamp.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+    @staticmethod
+    def parse_time(value):
+        """Unix seconds from a number or an ISO-8601 string"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+    @classmethod
+    def write(cls, path, chunks, fmt=None, name=None):
+        """Write chunks to `path` atomically; returns the number of fixes written"""
+        path = Path(path)
+        fmt = cls.format_of(path, fmt)
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            if fmt == "columnar":
+                with open(tmp, "wb") as f:
+                    rows = cls._write_columnar(f, chunks)
             else:
-                return "dynamic_ip", carrier_name, country
-                
-        except Exception as e:
-            return "unknown_ip", "Unknown Carrier", "Unknown Country"
+                with open(tmp, "w", newline="", encoding="utf-8") as f:
+                    if fmt == "gpx":
+                        rows = cls._write_gpx(f, chunks, name)
+                    else:
+                        rows = getattr(cls, f"_write_{fmt}")(f, chunks)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return rows
+
+    @staticmethod
+    def _feature_lines(chunks):
+        for lats, lons, stamps in chunks:
+            for lat, lon, ts in zip(lats, lons, stamps):
+                yield json.dumps(LiveMap.feature(lat, lon, ts), separators=(",", ":"))
+
+    @classmethod
+    def _write_geojsonl(cls, f, chunks):
+        rows = 0
+        for line in cls._feature_lines(chunks):
+            f.write(line + "\n")
+            rows += 1
+        return rows
+
+    @classmethod
+    def _write_geojson(cls, f, chunks):
+        rows = 0
+        f.write('{"type":"FeatureCollection","features":[')
+        for line in cls._feature_lines(chunks):
+            f.write(("\n" if not rows else ",\n") + line)
+            rows += 1
+        f.write("\n]}\n")
+        return rows
+
+    @classmethod
+    def _write_gpx(cls, f, chunks, name=None):
+        rows = 0
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<gpx version="1.1" creator="SIGMA CYBER TRACKER" xmlns="{cls.GPX_NS}">\n<trk>\n')
+        if name:
+            f.write(f"<name>{saxutils.escape(str(name))}</name>\n")
+        f.write("<trkseg>\n")
+        for lats, lons, stamps in chunks:
+            f.writelines(f'<trkpt lat="{lat!r}" lon="{lon!r}"><time>{cls.iso_time(ts)}</time></trkpt>\n'
+                         for lat, lon, ts in zip(lats, lons, stamps))
+            rows += len(stamps)
+        f.write("</trkseg>\n</trk>\n</gpx>\n")
+        return rows
+
+    @classmethod
+    def _write_csv(cls, f, chunks):
+        rows = 0
+        writer = csv.writer(f)
+        writer.writerow(cls.CSV_FIELDS)
+        for lats, lons, stamps in chunks:
+            writer.writerows(zip(stamps, lats, lons))
+            rows += len(stamps)
+        return rows
+
+    @staticmethod
+    def _write_columnar(f, chunks):
+        # Timestamps go straight to the file; lat/lon spill to temp files until the row count is known
+        rows = 0
+        f.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, 3, 0))
+        with tempfile.TemporaryFile() as lat_spill, tempfile.TemporaryFile() as lon_spill:
+            for lats, lons, stamps in chunks:
+                f.write(array('d', stamps))
+                lat_spill.write(array('d', lats))
+                lon_spill.write(array('d', lons))
+                rows += len(stamps)
+            for spill in (lat_spill, lon_spill):
+                spill.seek(0)
+                shutil.copyfileobj(spill, f)
+        f.seek(0)
+        f.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, 3, rows))
+        return rows
+
+    @classmethod
+    def read(cls, path, fmt=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """Yield (lats, lons, stamps) arrays of at most `chunk_rows` fixes from an export"""
+        fmt = cls.format_of(path, fmt)
+        if fmt == "columnar":
+            with ColumnarTrack(path) as track:
+                yield from track.chunks(chunk_rows)
+            return
+        lats, lons, stamps = array('d'), array('d'), array('d')
+        for lat, lon, ts in getattr(cls, f"_read_{fmt}")(path):
+            lats.append(lat)
+            lons.append(lon)
+            stamps.append(ts)
+            if len(stamps) >= chunk_rows:
+                yield lats, lons, stamps
+                lats, lons, stamps = array('d'), array('d'), array('d')
+        if stamps:
+            yield lats, lons, stamps
+
+    @classmethod
+    def _point(cls, feature):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") != "Point":
+            return None
+        props = feature.get("properties") or {}
+        when = props.get("t", props.get("time"))
+        if when is None:
+            return None
+        lon, lat = geometry["coordinates"][:2]
+        return float(lat), float(lon), cls.parse_time(when)
+
+    @classmethod
+    def _read_geojson(cls, path):
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+        features = doc.get("features", [doc]) if isinstance(doc, dict) else []
+        for feature in features:
+            point = cls._point(feature)
+            if point:
+                yield point
+
+    @classmethod
+    def _read_geojsonl(cls, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    point = cls._point(json.loads(line))
+                    if point:
+                        yield point
+
+    @classmethod
+    def _read_gpx(cls, path):
+        for _, elem in ElementTree.iterparse(path):
+            if elem.tag.rpartition("}")[2] != "trkpt":
+                continue
+            when = next((child.text for child in elem if child.tag.rpartition("}")[2] == "time"), None)
+            if when:
+                yield float(elem.get("lat")), float(elem.get("lon")), cls.parse_time(when.strip())
+            elem.clear()
+
+    @classmethod
+    def _read_csv(cls, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield float(row["lat"]), float(row["lon"]), cls.parse_time(row["t"])
+
+class TrackSimplifier:
+    """Pre-render reduction so map size follows track shape, not point count"""
+    @staticmethod
+    def dedupe(lats, lons):
+        """Indices of fixes that differ from the previous one, plus run lengths"""
+        keep, runs = [], []
+        prev = None
+        for i, point in enumerate(zip(lats, lons)):
+            if point == prev:
+                runs[-1] += 1
+                continue
+            keep.append(i)
+            runs.append(1)
+            prev = point
+        return keep, runs
+
+    @staticmethod
+    def tolerance_for_zoom(zoom, lat, pixels=MAP_TOLERANCE_PX):
+        """Tolerance in degrees matching `pixels` on a web-mercator map at `zoom`"""
+        meters_per_px = 156543.03392 * math.cos(math.radians(lat)) / (2 ** zoom)
+        return pixels * meters_per_px / 111320.0
+
+    @staticmethod
+    def douglas_peucker(points, tolerance):
+        """Iterative Douglas-Peucker; returns indices of the points to keep"""
+        n = len(points)
+        if n < 3 or tolerance <= 0:
+            return list(range(n))
+        # Work in a locally equirectangular plane so lon degrees shrink with latitude
+        kx = math.cos(math.radians(points[0][0]))
+        xy = [(lon * kx, lat) for lat, lon in points]
+        tol2 = tolerance * tolerance
+        keep = [False] * n
+        keep[0] = keep[-1] = True
+        stack = [(0, n - 1)]
+        while stack:
+            first, last = stack.pop()
+            ax, ay = xy[first]
+            bx, by = xy[last]
+            dx, dy = bx - ax, by - ay
+            seg2 = dx * dx + dy * dy
+            worst, worst_d2 = -1, tol2
+            for i in range(first + 1, last):
+                px, py = xy[i]
+                if seg2 == 0:
+                    d2 = (px - ax) ** 2 + (py - ay) ** 2
+                else:
+                    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / seg2))
+                    d2 = (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+                if d2 > worst_d2:
+                    worst, worst_d2 = i, d2
+            if worst != -1:
+                keep[worst] = True
+                stack.append((first, worst))
+                stack.append((worst, last))
+        return [i for i in range(n) if keep[i]]
+
+    @staticmethod
+    def cluster(lats, lons, indices, cell, max_markers=MAP_MAX_MARKERS):
+        """Grid-cluster marker indices; keeps the latest fix per cell with its member count"""
+        cells = OrderedDict()
+        while True:
+            cells.clear()
+            for i in indices:
+                key = (math.floor(lats[i] / cell), math.floor(lons[i] / cell)) if cell > 0 else i
+                count = cells.pop(key, (None, 0))[1]
+                cells[key] = (i, count + 1)
+            if len(cells) <= max_markers or cell <= 0:
+                break
+            cell *= 2
+        if len(cells) > max_markers:
+            step = len(cells) / max_markers
+            items = list(cells.values())
+            return [items[int(k * step)] for k in range(max_markers)]
+        return list(cells.values())
+
+    @classmethod
+    def simplify(cls, lats, lons, zoom=MAP_ZOOM, max_markers=MAP_MAX_MARKERS):
+        """Return (polyline points, [(index, members), ...] historical markers)"""
+        keep, _ = cls.dedupe(lats, lons)
+        if not keep:
+            return [], []
+        tolerance = cls.tolerance_for_zoom(zoom, lats[keep[-1]])
+        points = [(lats[i], lons[i]) for i in keep]
+        line = [points[j] for j in cls.douglas_peucker(points, tolerance)]
+        # The newest fix gets the main marker, so leave it out of the history layer
+        history = keep[:-1]
+        markers = cls.cluster(lats, lons, history, tolerance * 4, max_markers) if history else []
+        return line, markers
+
+# Appended to the folium map script: loads TRACK_FILE and keeps appending new lines.
+# Deferred to DOMContentLoaded because folium declares the map later in the same script.
+# Mirrors TrackSimplifier in the page: the polyline drops vertices closer than the pixel
+# tolerance, and historical markers are spaced like clusters and capped at MAP_MAX_MARKERS.
+MAP_FEED_JS = """
+document.addEventListener("DOMContentLoaded", function() {
+    var map = %(map)s;
+    var renderer = L.canvas();
+    var path = L.polyline([], {color: "red", weight: 2.5, opacity: 0.7, renderer: renderer}).addTo(map);
+    var tolerance = %(tolerance).8f;
+    var maxMarkers = %(max_markers)d;
+    var markers = [];
+    var anchor = null;
+    var tail = false;
+    var current = null;
+    var count = 0;
+    var seen = 0;
+    var last = null;
+    var events = null;
+    function stamp(t) { return new Date(t * 1000).toLocaleString(); }
+    function far(a, b, d) {
+        var dy = a.lat - b.lat, dx = (a.lng - b.lng) * Math.cos(a.lat * Math.PI / 180);
+        return dx * dx + dy * dy >= d * d;
+    }
+    // Radial-distance decimation: a vertex is kept once it is `tolerance` away from the last
+    // kept one; fixes in between only move a single trailing vertex to the current position
+    function extendPath(ll) {
+        var keep = !anchor || far(anchor, ll, tolerance);
+        if (tail) {
+            var pts = path.getLatLngs();
+            pts[pts.length - 1] = ll;
+            path.setLatLngs(pts);
+        } else {
+            path.addLatLng(ll);
+        }
+        tail = !keep;
+        if (keep) { anchor = ll; }
+    }
+    function addFix(f) {
+        var p = f.properties || {};
+        if (last && p.t <= last.t) { return; }  // already delivered by the other channel
+        var ll = L.latLng(f.geometry.coordinates[1], f.geometry.coordinates[0]);
+        if (current) {
+            var prev = current.getLatLng();
+            if (!markers.length || far(markers[markers.length - 1].getLatLng(), prev, tolerance * 4)) {
+                markers.push(L.circleMarker(prev, {radius: 3, color: "#00ff00", fill: true,
+                    fillColor: "#00ff00", fillOpacity: 0.7, renderer: renderer})
+                    .bindPopup("HISTORICAL POINT " + count + "<br>" + stamp(last.t)).addTo(map));
+                if (markers.length > maxMarkers) { map.removeLayer(markers.shift()); }
+            }
+            current.setLatLng(ll);
+        } else {
+            current = L.marker(ll, {icon: L.AwesomeMarkers.icon({icon: "crosshairs", prefix: "fa",
+                markerColor: "red"})}).bindTooltip("CURRENT POSITION").addTo(map);
+            map.setView(ll, map.getZoom());
+        }
+        current.bindPopup("<b>TARGET: " + (p.imei || "UNKNOWN") + "</b><br>IP: " + (p.ip || "CLASSIFIED") +
+            "<br>ORG: " + (p.org || "UNKNOWN") + "<br>LOCATION: " + (p.city || "Unknown") + ", " +
+            (p.country || "Unknown") + "<br>LAST UPDATE: " + stamp(p.t));
+        extendPath(ll);
+        last = p;
+        count += 1;
+    }
+    function poll() {
+        fetch("%(feed)s", {cache: "no-cache"}).then(function(r) { return r.text(); }).then(function(text) {
+            var lines = text.split("\\n");
+            if (lines.length - 1 < seen) { location.reload(); return; }  // feed was rebuilt
+            for (var i = seen; i < lines.length; i++) {
+                if (lines[i]) { addFix(JSON.parse(lines[i])); }
+            }
+            seen = lines.length - 1;
+        }).catch(function() {});
+    }
+    poll();
+    if (window.EventSource) {
+        events = new EventSource("%(events)s");
+        events.onopen = poll;  // catch up on anything published before the stream opened
+        events.onmessage = function(e) { addFix(JSON.parse(e.data)); };
+    }
+    // Polling is only the fallback while the live stream is down
+    setInterval(function() {
+        if (!events || events.readyState !== 1) { poll(); }
+    }, %(interval)d);
+});
+"""
+
+class LiveMap:
+    """Static map page generated once plus a line-delimited GeoJSON feed appended per fix"""
+    def __init__(self, shell_path=MAP_FILE, feed_path=TRACK_FILE):
+        self.shell_path = Path(shell_path)
+        self.feed_path = Path(feed_path)
+        ensure_dir(self.shell_path.parent)
+        ensure_dir(self.feed_path.parent)
+        self._lock = threading.Lock()
+        self._last = None
+
+    @staticmethod
+    def feature(lat, lon, ts, info=None):
+        props = {"t": round(ts, 3)}
+        if info:
+            for key in ("imei", "ip", "org", "city", "country"):
+                if info.get(key) is not None:
+                    props[key] = info[key]
+        return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": props}
+
+    def append(self, lat, lon, ts, info=None):
+        """O(1) append of one fix; returns the written feature line, or None for a repeat"""
+        with self._lock:
+            if self._last == (lat, lon):
+                return None
+            line = json.dumps(self.feature(lat, lon, ts, info), separators=(",", ":"))
+            with open(self.feed_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._last = (lat, lon)
+            return line
+
+    def _tail_timestamp(self):
+        try:
+            with open(self.feed_path, "rb") as f:
+                end = f.seek(0, os.SEEK_END)
+                f.seek(max(0, end - 4096))
+                lines = f.read().splitlines()
+            return json.loads(lines[-1])["properties"]["t"] if lines else None
+        except (OSError, ValueError, KeyError, IndexError):
+            return None
+
+    def sync(self, history, info=None):
+        """Rebuild the feed from history only when it doesn't already end at the same fix"""
+        if not history:
+            return False
+        lats, lons, stamps = history.columns()
+        lat, lon = lats[-1], lons[-1]
+        # The feed skips repeated positions, so compare against the start of the last run
+        i = len(stamps) - 1
+        while i > 0 and lats[i - 1] == lat and lons[i - 1] == lon:
+            i -= 1
+        if self._tail_timestamp() == round(stamps[i], 3):
+            with self._lock:
+                self._last = (lat, lon)
+            return False
+        keep, _ = TrackSimplifier.dedupe(lats, lons)
+        tmp = self.feed_path.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for i in keep:
+                    f.write(json.dumps(self.feature(lats[i], lons[i], stamps[i], info),
+                                       separators=(",", ":")) + "\n")
+            os.replace(tmp, self.feed_path)
+            self._last = (lat, lon)
+        return True
+
+    @staticmethod
+    def _base_map(lat, lon):
+        # Create map with dark theme and proper attribution
+        m = folium.Map(
+            location=[lat, lon],
+            zoom_start=MAP_ZOOM,
+            tiles='CartoDB dark_matter',
+            attr='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors, &copy; <a href="https://carto.com/attribution">CARTO</a>'
+        )
+        
+        # Add toner layer with proper attribution
+        folium.TileLayer(
+            'Stamen Toner',
+            attr='Map tiles by <a href="http://stamen.com">Stamen Design</a>, under <a href="http://creativecommons.org/licenses/by/3.0">CC BY 3.0</a>. Data by <a href="http://openstreetmap.org">OpenStreetMap</a>, under <a href="http://creativecommons.org/licenses/by-sa/3.0">CC BY SA</a>',
+            name='Stamen Toner'
+        ).add_to(m)
+        
+        folium.LayerControl().add_to(m)
+        return m
+
+    def _shell_params(self, lat):
+        return {
+            "feed": self.feed_path.name,
+            "events": SSE_PATH,
+            "interval": MAP_POLL_MS,
+            # Two significant digits, so the shell is only rebuilt when the latitude moves noticeably
+            "tolerance": float(f"{TrackSimplifier.tolerance_for_zoom(MAP_ZOOM, lat):.2g}"),
+            "max_markers": MAP_MAX_MARKERS
+        }
+
+    @staticmethod
+    def shell_version(params):
+        """Checksum of MAP_FEED_JS and its settings, stamped into the shell it builds"""
+        return f"{zlib.crc32(repr((MAP_FEED_JS, sorted(params.items()))).encode()):08x}"
+
+    def shell_is_current(self, version):
+        try:
+            return f"<!-- {MAP_SHELL_MARKER} {version} -->".encode() in self.shell_path.read_bytes()
+        except OSError:
+            return False
+
+    def ensure_shell(self, lat, lon, force=False):
+        """Write the map page unless one built from the current feed script exists.
+
+        Shells without a matching marker (older releases, the old static map) are rewritten;
+        later fixes reach the page through the feed.
+        """
+        params = self._shell_params(lat)
+        version = self.shell_version(params)
+        if not force and self.shell_is_current(version):
+            return False
+        with MAP_RENDER_SECONDS.time(kind="shell"):
+            self._write_shell(lat, lon, params, version)
+        return True
+
+    def _write_shell(self, lat, lon, params, version):
+        m = self._base_map(lat, lon)
+        m.get_root().header.add_child(folium.Element(f"<!-- {MAP_SHELL_MARKER} {version} -->"))
+        # A throwaway Icon pulls the AwesomeMarkers assets into the page header
+        folium.Marker([lat, lon], icon=folium.Icon(color='red', icon='crosshairs', prefix='fa'),
+                      opacity=0).add_to(m)
+        m.get_root().script.add_child(folium.Element(MAP_FEED_JS % dict(params, map=m.get_name())))
+        tmp = self.shell_path.with_suffix(".tmp")
+        m.save(str(tmp))
+        os.replace(tmp, self.shell_path)
+
+    @classmethod
+    def export_snapshot(cls, path, history, info=None):
+        """Self-contained map of the whole track, simplified so size follows track shape"""
+        with MAP_RENDER_SECONDS.time(kind="snapshot"):
+            cls._write_snapshot(path, history, info or {})
+
+    @classmethod
+    def _write_snapshot(cls, path, history, info):
+        lat, lon, timestamp = history[-1]
+        m = cls._base_map(lat, lon)
+        
+        # Add main marker
+        popup_text = (f"<b>TARGET: {info.get('imei', 'UNKNOWN')}</b><br>"
+                     f"IP: {info.get('ip', 'CLASSIFIED')}<br>"
+                     f"ORG: {info.get('org', 'UNKNOWN')}<br>"
+                     f"LOCATION: {info.get('city', 'Unknown')}, {info.get('country', 'Unknown')}<br>"
+                     f"LAST UPDATE: {datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        folium.Marker(
+            [lat, lon], 
+            tooltip="CURRENT POSITION",
+            popup=popup_text,
+            icon=folium.Icon(color='red', icon='crosshairs', prefix='fa')
+        ).add_to(m)
+        
+        # Add historical path
+        lats, lons, stamps = history.columns()
+        points, markers = TrackSimplifier.simplify(lats, lons)
+        folium.PolyLine(points, color="red", weight=2.5, opacity=0.7).add_to(m)
+        
+        # Add historical markers, clustered (last point already has the main marker)
+        for i, members in markers:
+            label = f"HISTORICAL POINT {i+1}" + (f" (+{members - 1} NEARBY)" if members > 1 else "")
+            folium.CircleMarker(
+                location=[lats[i], lons[i]],
+                radius=3,
+                color='#00ff00',
+                fill=True,
+                fill_color='#00ff00',
+                fill_opacity=0.7,
+                popup=f"{label}<br>{datetime.datetime.fromtimestamp(stamps[i]).strftime('%Y-%m-%d %H:%M:%S')}"
+            ).add_to(m)
+        
+        m.save(str(path))
+
+class FixBroadcaster:
+    """Fan-out of feed lines to connected Server-Sent Events clients"""
+    def __init__(self, backlog=SSE_CLIENT_BACKLOG):
+        self.backlog = backlog
+        self.seq = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.backlog)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    @property
+    def clients(self):
+        return len(self._subscribers)
+
+    def publish(self, data):
+        with self._lock:
+            self.seq += 1
+            message = (self.seq, data)
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Slow client: drop its oldest message rather than block the tracker
+                try:
+                    q.get_nowait()
+                    q.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+class IMEIValidator:
+    """IMEI (15 digits, Luhn check digit) / IMEISV (16 digits) validation and normalization"""
+    # Separators commonly found in printed or exported identifiers
+    SEPARATORS = str.maketrans("", "", " -./\t")
+    REPORT_FIELDS = ["row", "raw", "normalized", "kind", "tac", "valid", "error"]
+    _np = False  # resolved on first bulk call: numpy module or None
+
+    @classmethod
+    def normalize(cls, raw):
+        return (raw or "").strip().translate(cls.SEPARATORS)
+
+    @staticmethod
+    def check_digit(body):
+        """Luhn check digit for the first 14 digits of an IMEI"""
+        total = 0
+        for i, ch in enumerate(body[:14]):
+            d = ord(ch) - 48
+            if i % 2:
+                d *= 2
+                if d > 9:
+                    d -= 9
+            total += d
+        return (10 - total % 10) % 10
+
+    @staticmethod
+    def tac(imei):
+        """Type Allocation Code: the first 8 digits"""
+        return imei[:8]
+
+    @classmethod
+    def validate(cls, raw):
+        """Return (normalized, kind, error); error is None for a valid identifier"""
+        value = cls.normalize(raw)
+        if not value:
+            return value, None, "empty"
+        if not (value.isascii() and value.isdigit()):
+            return value, None, "non-digit characters"
+        if len(value) == 15:
+            expected = cls.check_digit(value)
+            if ord(value[14]) - 48 != expected:
+                return value, "IMEI", f"check digit mismatch (expected {expected})"
+            return value, "IMEI", None
+        if len(value) == 16:
+            # IMEISV carries a 2-digit software version instead of a check digit
+            return value, "IMEISV", None
+        return value, None, f"bad length {len(value)}"
+
+    @classmethod
+    def numpy(cls):
+        if cls._np is False:
+            cls._np = optional_import("numpy")
+        return cls._np
+
+    @classmethod
+    def validate_many(cls, values):
+        """Validate a batch; the Luhn pass is vectorized when NumPy is available"""
+        np = cls.numpy()
+        if np is None or len(values) < 64:
+            return [cls.validate(v) for v in values]
+        normalized = [cls.normalize(v) for v in values]
+        results = [None] * len(normalized)
+        imei_rows = []
+        for i, value in enumerate(normalized):
+            n = len(value)
+            if n == 15:
+                imei_rows.append(i)
+            elif n == 16:
+                ok = value.isascii() and value.isdigit()
+                results[i] = (value, "IMEISV" if ok else None, None if ok else "non-digit characters")
+            elif n == 0:
+                results[i] = (value, None, "empty")
+            elif not (value.isascii() and value.isdigit()):
+                results[i] = (value, None, "non-digit characters")
+            else:
+                results[i] = (value, None, f"bad length {n}")
+        if imei_rows:
+            # errors="replace" keeps one byte per character, so rows stay 15 wide
+            blob = "".join(normalized[i] for i in imei_rows).encode("ascii", "replace")
+            digits = np.frombuffer(blob, dtype=np.uint8).reshape(-1, 15).astype(np.int16) - 48
+            non_digit = ((digits < 0) | (digits > 9)).any(axis=1)
+            doubled = digits[:, 1:14:2] * 2
+            doubled -= 9 * (doubled > 9)
+            total = digits[:, 0:14:2].sum(axis=1) + doubled.sum(axis=1)
+            expected = (10 - total % 10) % 10
+            bad = expected != digits[:, 14]
+            for j, i in enumerate(imei_rows):
+                value = normalized[i]
+                if non_digit[j]:
+                    results[i] = (value, None, "non-digit characters")
+                elif bad[j]:
+                    results[i] = (value, "IMEI", f"check digit mismatch (expected {int(expected[j])})")
+                else:
+                    results[i] = (value, "IMEI", None)
+        return results
+
+    @classmethod
+    def validate_file(cls, path, report_path=None, column=0, has_header=None,
+                      chunk_rows=VALIDATE_CHUNK_ROWS):
+        """Stream a CSV/text inventory in bounded chunks, optionally writing a per-row report.
+
+        `column` is an index or a header name (which implies a header row).
+        Returns a summary dict with valid/invalid counts.
+        """
+        if has_header is None:
+            has_header = isinstance(column, str)
+        summary = {"rows": 0, "valid": 0, "invalid": 0, "imei": 0, "imeisv": 0}
+        report = None
+        with open(path, newline="", encoding="utf-8", errors="replace") as src:
+            reader = csv.reader(src)
+            first_row = 1
+            if has_header:
+                header = next(reader, [])
+                first_row = 2
+                if isinstance(column, str):
+                    column = header.index(column)
+            try:
+                if report_path:
+                    report = open(report_path, "w", newline="", encoding="utf-8")
+                    writer = csv.writer(report)
+                    writer.writerow(cls.REPORT_FIELDS)
+                row_no = first_row
+                while True:
+                    chunk = [row[column] if len(row) > column else "" for _, row in
+                             zip(range(chunk_rows), reader)]
+                    if not chunk:
+                        break
+                    results = cls.validate_many(chunk)
+                    for raw, (value, kind, error) in zip(chunk, results):
+                        summary["rows"] += 1
+                        if error is None:
+                            summary["valid"] += 1
+                            summary[kind.lower()] += 1
+                        else:
+                            summary["invalid"] += 1
+                    if report:
+                        writer.writerows(
+                            [row_no + k, raw, value, kind or "", cls.tac(value) if kind else "",
+                             "1" if error is None else "0", error or ""]
+                            for k, (raw, (value, kind, error)) in enumerate(zip(chunk, results)))
+                    row_no += len(chunk)
+            finally:
+                if report:
+                    report.close()
+        return summary
+
+class IMEITracker:
+    _lookups = OrderedDict()  # number prefix -> (ip_range, carrier, country)
+    _lookup_lock = threading.Lock()
+    lookup_hits = 0
+    lookup_misses = 0
+
+    @staticmethod
+    def pseudo_number(imei):
+        """Convert IMEI to E.164 format phone number (simplified)"""
+        country_code = "44"  # Default to UK
+        if len(imei) >= 15:
+            # Extract potential country code from IMEI TAC
+            tac = imei[:8]
+            # This would normally require a TAC database - we'll simulate
+            country_code = TAC_COUNTRY_CODES.get(tac[:2], "44")
+        return f"+{country_code}{imei[-9:]}"
+
+    @staticmethod
+    def _describe(pseudo_number):
+        """Parse once and resolve carrier, region and the simulated carrier IP range"""
+        phone_number = phonenumbers.parse(pseudo_number, None)
+        carrier_name = carrier.name_for_number(phone_number, "en")
+        country = phone_geocoder.description_for_number(phone_number, "en")
+        
+        # Get carrier IP ranges (simulated)
+        lowered = carrier_name.lower()
+        for needle, ip_range in CARRIER_IP_RANGES:
+            if needle in lowered:
+                return ip_range, carrier_name, country
+        return "dynamic_ip", carrier_name, country
+
+    @classmethod
+    def lookup_numbers(cls, numbers):
+        """Resolve many E.164 numbers, parsing each distinct prefix only once"""
+        results = [None] * len(numbers)
+        pending = {}
+        with cls._lookup_lock:
+            for i, number in enumerate(numbers):
+                # Carrier/region metadata is a longest-prefix table, so numbers that share
+                # the country code and leading national digits resolve identically
+                key = number[:CARRIER_PREFIX_LEN]
+                cached = cls._lookups.get(key)
+                if cached is not None:
+                    cls._lookups.move_to_end(key)
+                    cls.lookup_hits += 1
+                    results[i] = cached
+                else:
+                    pending.setdefault(key, []).append(i)
+        for key, indices in pending.items():
+            try:
+                value = cls._describe(numbers[indices[0]])
+            except Exception:
+                value = None
+            for i in indices:
+                results[i] = value or ("unknown_ip", "Unknown Carrier", "Unknown Country")
+            with cls._lookup_lock:
+                cls.lookup_misses += 1
+                if value is not None:
+                    cls._lookups[key] = value
+                    while len(cls._lookups) > CARRIER_CACHE_SIZE:
+                        cls._lookups.popitem(last=False)
+        return results
+
+    @classmethod
+    def get_ips_from_imeis(cls, imeis):
+        """Batch form of get_ip_from_imei"""
+        numbers = []
+        for imei in imeis:
+            try:
+                numbers.append(cls.pseudo_number(imei))
+            except Exception:
+                numbers.append("")
+        return cls.lookup_numbers(numbers)
+
+    @classmethod
+    def get_ip_from_imei(cls, imei):
+        """Convert IMEI to phone number format and lookup carrier IP ranges"""
+        return cls.get_ips_from_imeis([imei])[0]
     
     @staticmethod
     def resolve_ip_range(ip_range):
@@ -186,8 +2322,362 @@ class IMEITracker:
                 parts[3] = str(random.randint(1, 254))
             return ".".join(parts)
 
+def make_spill_logger(path=CONSOLE_SPILL_FILE, max_bytes=CONSOLE_SPILL_BYTES, backups=CONSOLE_SPILL_BACKUPS):
+    """Rotating file logger that receives scrollback trimmed from the console"""
+    logger = logging.getLogger("sigma.console")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        ensure_dir(Path(path).parent)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                      encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+class RefreshScheduler:
+    """Drift-free tick source for the tracking loop.
+
+    Ticks sit on a monotonic grid, so the period doesn't stretch by however long a
+    refresh took; ticks missed by an overrun are skipped rather than fired back to
+    back. adapt() stretches the interval while fixes are unchanged or providers
+    throttle, and stop() wakes a waiting loop immediately.
+    """
+    def __init__(self, interval=REFRESH, max_interval=REFRESH_MAX, backoff=REFRESH_BACKOFF,
+                 stable_ticks=REFRESH_STABLE_TICKS):
+        self.base_interval = interval
+        self.interval = interval
+        self.max_interval = max(interval, max_interval)
+        self.backoff = backoff
+        self.stable_ticks = stable_ticks
+        self.stable = 0
+        self.skipped = 0
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def stop(self):
+        self._cancel.set()
+
+    def adapt(self, changed, throttled=False):
+        """Back off while the fix is stable or providers rate-limit; snap back on movement"""
+        self.stable = 0 if changed else self.stable + 1
+        if throttled or self.stable >= self.stable_ticks:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        elif changed:
+            self.interval = self.base_interval
+        return self.interval
+
+    def ticks(self):
+        """Yield once per tick until stop(); yields the number of ticks skipped before this one"""
+        deadline = time.monotonic()
+        missed = 0
+        while not self._cancel.is_set():
+            yield missed
+            deadline += self.interval
+            now = time.monotonic()
+            missed = 0
+            if now >= deadline:
+                # Overran: coalesce the missed ticks and stay on the grid
+                missed = int((now - deadline) // self.interval) + 1
+                deadline += missed * self.interval
+                self.skipped += missed
+            if self._cancel.wait(deadline - now):
+                return
+
+class TrackerEngine:
+    """GUI-independent core: lookups, track history, persistence, live map and map server.
+
+    The Tk front-end and the headless CLI are both thin clients of this class.
+    `log` receives human-readable status lines and may be called from any thread.
+    """
+    def __init__(self, save_dir=SAVE_DIR, log=None, refresh=REFRESH, port=PORT):
+        self.save_dir = Path(save_dir)
+        ensure_dir(self.save_dir)
+        self.log = log or self.stderr_log
+        self.refresh = refresh
+        self.port = port
+        self.geo_cache = GeoCache(self.save_dir / GEO_CACHE_FILE.name)
+        self.ip_db = self._open_ip_db()
+        self.profiler = ProfileCapture(self.save_dir)
+        self.gps = GPSTracker(cache=self.geo_cache, ip_db=self.ip_db, profiler=self.profiler)
+        if IPRangeDB.is_stale(self.save_dir):
+            threading.Thread(target=self._compile_ip_db, name="sigma-ipdb", daemon=True).start()
+        self.tracking = False
+        self.scheduler = None
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.data = {}
+        self.history = TrackHistory()
+        self.journal = HistoryJournal(self.save_dir / HISTORY_FILE.name)
+        self.journal.load_into(self.history)
+        self.live_map = LiveMap(self.save_dir / MAP_FILE.name, self.save_dir / TRACK_FILE.name)
+        self.live_map.sync(self.history)
+        self.events = FixBroadcaster()
+        self.server = None
+        self.server_started = False
+        self._register_metrics()
+
+    def _open_ip_db(self):
+        try:
+            return IPRangeDB.load(self.save_dir)
+        except Exception as e:
+            self.log(f"⚠️ OFFLINE IP DATABASE UNAVAILABLE: {e}")
+            return None
+
+    def _compile_ip_db(self):
+        """Rebuild the index from a newer ip_ranges.csv off the startup path, then switch to it"""
+        self.log("🗄️ COMPILING OFFLINE IP DATABASE IN THE BACKGROUND...")
+        try:
+            summary = IPRangeDB.compile(self.save_dir / IP_DB_SOURCE.name, self.save_dir / IP_DB_FILE.name)
+            db = IPRangeDB(summary["path"])
+        except Exception as e:
+            self.log(f"⚠️ OFFLINE IP DATABASE COMPILE FAILED: {e}")
+            return
+        # The previous database may still be serving a lookup, so it is left to the GC
+        self.ip_db = db
+        self.gps.use_ip_db(db)
+        self.log(f"🗄️ OFFLINE IP DATABASE READY: {summary['ranges']} RANGES")
+
+    def _register_metrics(self):
+        cache, gps = self.geo_cache, self.gps
+        METRICS.gauge("sigma_geo_cache_hits_total", "Geolocation cache hits", lambda: cache.hits, kind="counter")
+        METRICS.gauge("sigma_geo_cache_misses_total", "Geolocation cache misses", lambda: cache.misses,
+                      kind="counter")
+        METRICS.gauge("sigma_geo_cache_entries", "Entries in the geolocation cache", lambda: len(cache))
+        METRICS.gauge("sigma_refresh_interval_seconds", "Current (adaptive) refresh interval",
+                      lambda: self.scheduler.interval if self.scheduler else self.refresh)
+        METRICS.gauge("sigma_tracking", "1 while the tracking loop is running", lambda: int(self.tracking))
+        METRICS.gauge("sigma_history_points", "Fixes held in the in-memory history", lambda: len(self.history))
+        METRICS.gauge("sigma_sse_clients", "Connected live-map stream clients", lambda: self.events.clients)
+        METRICS.gauge("sigma_provider_breaker_open", "1 while a provider's circuit breaker is open",
+                      lambda: {name: int(snap["breaker"] == "open")
+                               for name, snap in gps.health.snapshot().items()}, ("provider",))
+        METRICS.gauge("sigma_carrier_lookup_hits_total", "Memoized carrier lookups served from cache",
+                      lambda: IMEITracker.lookup_hits, kind="counter")
+
+    def metrics_summary(self):
+        """Short dict of headline numbers for status displays"""
+        cache = self.geo_cache.stats()
+        return {
+            "refresh_mean": REFRESH_SECONDS.mean(),
+            "refresh_interval": round(self.scheduler.interval if self.scheduler else self.refresh, 1),
+            "overruns": REFRESH_OVERRUNS.total(),
+            "cache_hit_rate": cache["hit_rate"],
+            "map_render_mean": MAP_RENDER_SECONDS.mean(kind="shell"),
+            "http_requests": HTTP_REQUESTS.total(),
+            "sse_clients": self.events.clients,
+            "profiling": self.profiler.active
+        }
+
+    def toggle_profiling(self):
+        """Start a capture, or stop it and return the written report paths"""
+        if self.profiler.active:
+            return self.profiler.stop()
+        self.profiler.start()
+        return None
+
+    @staticmethod
+    def stderr_log(msg):
+        ts = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{ts}] {msg}", file=sys.stderr, flush=True)
+
+    def locate(self):
+        """One-shot location of this host, without recording it"""
+        return self.gps.get_location()
+
+    def record(self, info, ts=None):
+        """Add a fix to history, the journal, the live map feed and SSE clients"""
+        ts = time.time() if ts is None else ts
+        self.data.update(info)
+        self.history.append(info['lat'], info['lon'], ts)
+        self.journal.append(info['lat'], info['lon'], ts)
+        line = self.live_map.append(info['lat'], info['lon'], ts, self.data)
+        if line:
+            self.events.publish(line)
+        return ts
+
+    def fix_message(self, info):
+        return (f"📡 TARGET {self.data.get('imei', 'UNKNOWN')} → IP: {info['ip']} | ORG: {info['org']} "
+                f"| LOCATION: {info['city']}, {info['country']} "
+                f"| COORD: [{info['lat']:.5f},{info['lon']:.5f}] ±{info['accuracy']}km")
+
+    def start_tracking(self, imei):
+        """Start the background worker; returns False if one is already tracking"""
+        self.data['imei'] = imei
+        with self._worker_lock:
+            if self.tracking and self._worker is not None and self._worker.is_alive():
+                return False
+            # A worker still finishing a lookup after stop() sees its own scheduler
+            # cancelled and drops its result, so only this one records fixes
+            self.scheduler = RefreshScheduler(self.refresh)
+            self.tracking = True
+            self._worker = threading.Thread(target=self.track_loop, kwargs={"scheduler": self.scheduler},
+                                            name="sigma-tracker", daemon=True)
+            self._worker.start()
+        return True
+
+    def stop_tracking(self):
+        with self._worker_lock:
+            was_tracking = self.tracking
+            self.tracking = False
+            if self.scheduler is not None:
+                self.scheduler.stop()
+        return was_tracking
+
+    def track_loop(self, count=None, on_fix=None, scheduler=None):
+        """Record a fix per scheduler tick; stops after `count` recorded fixes (failed ticks don't count)"""
+        if scheduler is None:
+            scheduler = self.scheduler = RefreshScheduler(self.refresh)
+        done = 0
+        last = None
+        for missed in scheduler.ticks():
+            if missed:
+                REFRESH_OVERRUNS.inc(missed)
+            start = time.monotonic()
+            try:
+                info = self.profiler.run(self.gps.get_location)
+                if scheduler.cancelled:
+                    break
+                if info['ip'] == "Unknown":
+                    # Every provider failed: keep the (0, 0) placeholder out of history and the feed
+                    raise ProviderError("no provider returned a location")
+                info = dict(info, t=self.record(info))
+                if on_fix:
+                    on_fix(info)
+                self.log(self.fix_message(info))
+                fix = (info['lat'], info['lon'])
+                scheduler.adapt(fix != last, self.gps.health.throttled_since(start))
+                last = fix
+                done += 1
+            except Exception as e:
+                self.log(f"⚠️ TRACKING ERROR: {str(e)}")
+                scheduler.adapt(False, self.gps.health.throttled_since(start))
+            REFRESH_SECONDS.observe(time.monotonic() - start)
+            if count is not None and done >= count:
+                break
+
+    def trace(self, imei):
+        """Carrier/region lookup for an IMEI and geolocation of a sample carrier IP"""
+        result = {"imei": imei}
+        try:
+            # Get IP from IMEI
+            ip_range, carrier_name, country = IMEITracker.get_ip_from_imei(imei)
+            sample_ip = IMEITracker.resolve_ip_range(ip_range)
+            result.update(carrier=carrier_name, country=country, ip_range=ip_range, sample_ip=sample_ip)
+            
+            self.log(f"📡 CARRIER IDENTIFIED: {carrier_name}")
+            self.log(f"🌐 COUNTRY OF ORIGIN: {country}")
+            self.log(f"🔗 IP RANGE: {ip_range}")
+            self.log(f"🖧 SAMPLE IP: {sample_ip}")
+            
+            # Get location from IP
+            try:
+                self.log("🛰️ ACCESSING GEOLOCATION DATABASE...")
+                loc = self.gps.locate_ip(sample_ip)
+                result["location"] = loc
+                if loc:
+                    self.log(f"📍 TARGET LOCATION ACQUIRED: {loc['city']}, {loc['country']}")
+                    self.log(f"🎯 COORDINATES: {loc['lat']:.5f}, {loc['lon']:.5f}")
+                else:
+                    self.log("⚠️ GEOLOCATION FAILURE: INSUFFICIENT DATA")
+            except Exception as e:
+                result["error"] = str(e)
+                self.log(f"⚠️ GEOLOCATION SERVICE UNAVAILABLE: {str(e)}")
+                
+        except Exception as e:
+            result["error"] = str(e)
+            self.log(f"❗ CRITICAL ERROR IN TRACE OPERATION: {str(e)}")
+        return result
+
+    @property
+    def map_url(self):
+        return f"http://localhost:{self.port}/{self.live_map.shell_path.name}"
+
+    def prepare_map(self):
+        """Make sure the live map page exists; returns True if it was (re)generated"""
+        lat, lon, _ = self.history[-1]
+        return self.profiler.run(self.live_map.ensure_shell, lat, lon)
+
+    def export_map(self, path, t0=None, t1=None):
+        """Write a standalone, simplified map of the (optionally time-windowed) track"""
+        history = self.history
+        if t0 is not None or t1 is not None:
+            history = TrackHistory(capacity=None)
+            history.extend(*self.journal.read(t0, t1))
+        if not history:
+            raise ValueError("no location data in the requested window")
+        self.profiler.run(LiveMap.export_snapshot, path, history, self.data)
+        return len(history)
+
+    def export_history(self, path, fmt=None, t0=None, t1=None):
+        """Stream the (optionally time-windowed) journal to GeoJSON, GPX, CSV or columnar"""
+        return TrackExport.write(path, self.journal.chunks(t0, t1), fmt, name=self.data.get('imei'))
+
+    def import_history(self, path, fmt=None):
+        """Append fixes from an export; returns (imported, skipped).
+
+        Only fixes newer than the latest recorded one are kept so the journal and
+        history stay in time order for bisect.
+        """
+        last = self.history[-1][2] if self.history else float("-inf")
+        imported = skipped = 0
+        for lats, lons, stamps in TrackExport.read(path, fmt):
+            keep_lats, keep_lons, keep_stamps = array('d'), array('d'), array('d')
+            for lat, lon, ts in zip(lats, lons, stamps):
+                if ts <= last:
+                    skipped += 1
+                    continue
+                self.journal.append(lat, lon, ts)
+                keep_lats.append(lat)
+                keep_lons.append(lon)
+                keep_stamps.append(ts)
+                last = ts
+            if keep_stamps:
+                self.history.extend(keep_lats, keep_lons, keep_stamps)
+                imported += len(keep_stamps)
+        self.journal.flush()
+        if imported:
+            self.live_map.sync(self.history, self.data)
+        return imported, skipped
+
+    def serve(self):
+        """Run the map server in the calling thread until shutdown() is called"""
+        try:
+            # http.server (with email and http.client behind it) adds ~40 ms to a cold import,
+            # and most commands never serve anything
+            from sigma_map_server import MapServer
+            with MapServer((MAP_HOST, self.port), self.save_dir, events=self.events) as httpd:
+                self.server = httpd
+                self.log(f"🌐 SECURE SERVER ACTIVE ON PORT {self.port}")
+                self.server_started = True
+                httpd.serve_forever()
+        except Exception as e:
+            self.log(f"❗ SERVER CRITICAL ERROR: {e}")
+        finally:
+            self.server_started = False
+
+    def start_server(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def close(self):
+        self.stop_tracking()
+        self.gps.close()
+        if self.profiler.active:
+            self.profiler.stop()
+        if self.server is not None:
+            self.server.shutdown()
+        self.geo_cache.save()
+        self.journal.close()
+        if self.ip_db is not None:
+            self.ip_db.close()
+
 class SigmaTracker:
-    def __init__(self):
+    def __init__(self, save_dir=SAVE_DIR):
+        save_dir = Path(save_dir)
+        ensure_dir(save_dir)
         self.root = tk.Tk()
         self.root.title("☠ SIGMA CYBER TRACKER ☠")
         self.root.configure(bg=BG_COLOR)
@@ -195,20 +2685,24 @@ class SigmaTracker:
         self.root.minsize(800, 600)  # Minimum size for responsiveness
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
-        self.gps = GPSTracker()
-        self.tracking = False
-        self.data = {}
-        self.history = []
-        self.server_started = False
+        self.map_busy = False
+        self.log_queue = queue.SimpleQueue()
+        self.console_lines = 0
+        self.spill_log = make_spill_logger(save_dir / CONSOLE_SPILL_FILE.name)
+        self.engine = TrackerEngine(save_dir=save_dir, log=self.log)
+        METRICS.gauge("sigma_log_queue_depth", "Console lines waiting to be drawn", self.log_queue.qsize)
+        self._http_seen = (time.monotonic(), 0)
         
         # Setup GUI first to create console widget
         self.setup_gui()
+        self.root.after(LOG_FLUSH_MS, self.drain_log)
         
         # Start HTTP server after GUI is ready
-        threading.Thread(target=self.start_http_server, daemon=True).start()
+        self.engine.start_server()
         
         self.root.after(1000, self.update_status)
         self.root.mainloop()
+        self.engine.close()
 
     def setup_gui(self):
         # Main frame for responsiveness
@@ -238,6 +2732,8 @@ class SigmaTracker:
                                                 insertbackground=TEXT_COLOR, font=TERMINAL_FONT,
                                                 state='disabled', relief='flat')
         self.console.grid(row=0, column=0, sticky="nsew", padx=2, pady=2)
+        for tag, (color, _) in LOG_TAGS.items():
+            self.console.tag_configure(tag, foreground=color)
         
         # Add initial hacker message
         self.log("SYSTEM INITIALIZED...")
@@ -269,7 +2765,8 @@ class SigmaTracker:
             ("TERMINATE TRACKING", self.deactivate, "#f00"),
             ("TRACE LOCATION", self.trace_location, "#ff0"),
             ("VISUALIZE TRACK", self.draw_map, "#0ff"),
-            ("CLEAR CONSOLE", self.clear_log, "#aaa")
+            ("CLEAR CONSOLE", self.clear_log, "#aaa"),
+            ("PROFILER", self.toggle_profiler, "#f0f")
         ]
         
         for text, command, color in buttons:
@@ -284,9 +2781,15 @@ class SigmaTracker:
                              font=TERMINAL_FONT, anchor='w', relief='sunken', bd=1)
         status_bar.grid(row=3, column=0, sticky="ew", padx=2, pady=2)
 
+        # Metrics panel (same numbers as http://localhost:PORT/metrics)
+        self.metrics_var = tk.StringVar(value="")
+        metrics_bar = tk.Label(main_frame, textvariable=self.metrics_var, fg=SECONDARY_COLOR, bg="#111",
+                               font=("Courier", 10), anchor='w', relief='sunken', bd=1)
+        metrics_bar.grid(row=4, column=0, sticky="ew", padx=2, pady=(0, 2))
+
         # Hacker info panel
         info_frame = tk.Frame(main_frame, bg=BG_COLOR)
-        info_frame.grid(row=4, column=0, sticky="ew", pady=(5, 10))
+        info_frame.grid(row=5, column=0, sticky="ew", pady=(5, 10))
         
         info_text = tk.Label(info_frame, 
                             text="SIGMA CYBER GHOST | ENCRYPTED CHANNEL | TOR RELAY ACTIVE",
@@ -295,7 +2798,7 @@ class SigmaTracker:
         
         # Hacker contact info with social media profiles (FIXED)
         contact_frame = tk.Frame(main_frame, bg=BG_COLOR)
-        contact_frame.grid(row=5, column=0, sticky="ew", pady=(0, 10))
+        contact_frame.grid(row=6, column=0, sticky="ew", pady=(0, 10))
         
         contacts = [
             ("TELEGRAM", "t.me/sigma_cyber_ghost", "#0ff", "https://t.me/sigma_cyber_ghost"),
@@ -317,222 +2820,264 @@ class SigmaTracker:
             contact.bind("<Button-1>", lambda e, u=url: webbrowser.open(u))
 
     def log(self, msg):
-        if hasattr(self, 'console'):
+        """Queue a console line; safe to call from any thread"""
+        ts = datetime.datetime.now().strftime("%H:%M:%S")
+        self.log_queue.put(f"[{ts}] {msg}")
+
+    @staticmethod
+    def format_log_line(line):
+        """Split a line into Text.insert() chunk/tag pairs, highlighting keywords"""
+        chunks = []
+        pos = 0
+        for match in LOG_KEYWORD_RE.finditer(line):
+            if match.start() > pos:
+                chunks += [line[pos:match.start()], ()]
+            chunks += [match.group(), LOG_KEYWORD_TAG[match.group()]]
+            pos = match.end()
+        chunks += [line[pos:] + "\n", ()]
+        return chunks
+
+    def drain_log(self):
+        """Flush queued log lines into the console in one batch (Tk thread only)"""
+        chunks = []
+        count = 0
+        for _ in range(LOG_BATCH_MAX):
+            try:
+                line = self.log_queue.get_nowait()
+            except queue.Empty:
+                break
+            chunks += self.format_log_line(line)
+            # Text lines, not records: exception messages can span several
+            count += line.count("\n") + 1
+        if chunks:
             self.console.config(state='normal')
-            ts = datetime.datetime.now().strftime("%H:%M:%S")
-            
-            # Apply hacker-style formatting
-            formatted_msg = f"[{ts}] {msg}"
-            self.console.insert(tk.END, formatted_msg + "\n")
-            
-            # Apply color coding for specific keywords
-            self.console.tag_configure("success", foreground="#0f0")
-            self.console.tag_configure("warning", foreground="#ff0")
-            self.console.tag_configure("error", foreground="#f00")
-            self.console.tag_configure("info", foreground="#0ff")
-            
-            # Highlight keywords
-            for word in ["ACTIVATED", "TRACKING", "SUCCESS", "READY"]:
-                if word in msg:
-                    start_index = f"end - {len(msg) + 1}c"
-                    self.console.tag_add("success", start_index, f"{start_index} + {len(word)}c")
-            
-            for word in ["WARNING", "CAUTION", "ATTENTION"]:
-                if word in msg:
-                    start_index = f"end - {len(msg) + 1}c"
-                    self.console.tag_add("warning", start_index, f"{start_index} + {len(word)}c")
-            
-            for word in ["ERROR", "FAILED", "TERMINATED"]:
-                if word in msg:
-                    start_index = f"end - {len(msg) + 1}c"
-                    self.console.tag_add("error", start_index, f"{start_index} + {len(word)}c")
-            
-            for word in ["LOCATION", "IP", "COORDINATES"]:
-                if word in msg:
-                    start_index = f"end - {len(msg) + 1}c"
-                    self.console.tag_add("info", start_index, f"{start_index} + {len(word)}c")
-            
+            self.console.insert(tk.END, *chunks)
+            self.console_lines += count
+            if self.console_lines > CONSOLE_MAX_LINES:
+                self.trim_console()
             self.console.see(tk.END)
             self.console.config(state='disabled')
+        # Come back sooner while there is a backlog
+        self.root.after(1 if not self.log_queue.empty() else LOG_FLUSH_MS, self.drain_log)
+
+    def trim_console(self):
+        """Drop the oldest lines in one chunk, spilling them to the rotating console log"""
+        excess = self.console_lines - CONSOLE_MAX_LINES
+        n = min(self.console_lines, excess + CONSOLE_TRIM_CHUNK)
+        cut = f"{n + 1}.0"
+        try:
+            self.spill_log.info(self.console.get("1.0", cut).rstrip("\n"))
+        except Exception:
+            pass
+        self.console.delete("1.0", cut)
+        self.console_lines -= n
 
     def update_status(self):
-        if self.tracking:
-            status = f"🔴 TRACKING ACTIVE | TARGETS: {len(self.history)} | LAST UPDATE: {datetime.datetime.now().strftime('%H:%M:%S')}"
+        if self.engine.tracking:
+            status = f"🔴 TRACKING ACTIVE | TARGETS: {len(self.engine.history)} | LAST UPDATE: {datetime.datetime.now().strftime('%H:%M:%S')}"
         else:
             status = "🟢 SYSTEM READY | TRACKING: INACTIVE"
         self.status_var.set(status)
+        self.metrics_var.set(self.format_metrics())
         self.root.after(1000, self.update_status)
 
-    def activate(self):
-        imei = self.imei.get().strip()
-        if not imei:
+    def format_metrics(self):
+        m = self.engine.metrics_summary()
+        now = time.monotonic()
+        then, seen = self._http_seen
+        rate = (m["http_requests"] - seen) / max(now - then, 1e-6)
+        self._http_seen = (now, m["http_requests"])
+        refresh = f"{m['refresh_mean']:.2f}s" if m["refresh_mean"] is not None else "--"
+        render = f"{m['map_render_mean']:.2f}s" if m["map_render_mean"] is not None else "--"
+        return (f"REFRESH {refresh}/{m['refresh_interval']}s (OVERRUNS {int(m['overruns'])}) | "
+                f"CACHE {m['cache_hit_rate']:.0%} | LOG Q {self.log_queue.qsize()} | MAP {render} | "
+                f"HTTP {rate:.1f} req/s | SSE {m['sse_clients']}" + (" | ⏺ PROFILING" if m["profiling"] else ""))
+
+    def toggle_profiler(self):
+        reports = self.engine.toggle_profiling()
+        if reports:
+            self.log(f"📊 PROFILE SAVED: {reports[0].name}, {reports[1].name}")
+        else:
+            self.log("📊 PROFILER CAPTURE STARTED")
+
+    def read_target(self):
+        """Validated, normalized IMEI from the input box, or None after reporting the problem"""
+        raw = self.imei.get().strip()
+        if not raw:
             self.log("⚠️ INPUT ERROR: NO TARGET SPECIFIED")
             messagebox.showerror("Input Error", "No target IMEI/MSISDN specified!")
-            return
+            return None
             
-        # Validate IMEI format
-        if not (imei.isdigit() and len(imei) in [15, 16]):
+        # Validate IMEI format and check digit
+        imei, kind, error = IMEIValidator.validate(raw)
+        if kind is None:
             self.log("⚠️ SECURITY ALERT: INVALID IMEI/MSISDN FORMAT")
             messagebox.showerror("Invalid Format", "IMEI must be 15-16 digits!")
+            return None
+        if error:
+            self.log(f"⚠️ SECURITY ALERT: IMEI CHECK DIGIT FAILED ({error})")
+            messagebox.showerror("Invalid IMEI", f"IMEI failed the Luhn check: {error}")
+            return None
+        return imei
+
+    def activate(self):
+        imei = self.read_target()
+        if not imei:
             return
             
-        self.data['imei'] = imei
-        self.tracking = True
-        threading.Thread(target=self.track_loop, daemon=True).start()
+        if not self.engine.start_tracking(imei):
+            self.log(f"🔁 TRACKING ALREADY ACTIVE, TARGET SET TO: {imei}")
+            return
         self.log(f"✅ TRACKING ACTIVATED FOR TARGET: {imei}")
         self.log("🛰️ ACQUIRING SATELLITE POSITIONING...")
 
     def trace_location(self):
-        imei = self.imei.get().strip()
+        imei = self.read_target()
         if not imei:
-            self.log("⚠️ INPUT ERROR: NO TARGET SPECIFIED")
-            messagebox.showerror("Input Error", "No target IMEI/MSISDN specified!")
-            return
-            
-        # Validate IMEI format
-        if not (imei.isdigit() and len(imei) in [15, 16]):
-            self.log("⚠️ SECURITY ALERT: INVALID IMEI/MSISDN FORMAT")
-            messagebox.showerror("Invalid Format", "IMEI must be 15-16 digits!")
             return
             
         self.log(f"🔍 INITIATING LOCATION TRACE FOR TARGET: {imei}")
-        threading.Thread(target=self.perform_trace, args=(imei,), daemon=True).start()
-
-    def perform_trace(self, imei):
-        try:
-            # Get IP from IMEI
-            ip_range, carrier_name, country = IMEITracker.get_ip_from_imei(imei)
-            sample_ip = IMEITracker.resolve_ip_range(ip_range)
-            
-            self.log(f"📡 CARRIER IDENTIFIED: {carrier_name}")
-            self.log(f"🌐 COUNTRY OF ORIGIN: {country}")
-            self.log(f"🔗 IP RANGE: {ip_range}")
-            self.log(f"🖧 SAMPLE IP: {sample_ip}")
-            
-            # Get location from IP
-            try:
-                self.log("🛰️ ACCESSING GEOLOCATION DATABASE...")
-                g = geocoder.ip(sample_ip)
-                if g.ok:
-                    self.log(f"📍 TARGET LOCATION ACQUIRED: {g.city}, {g.country}")
-                    self.log(f"🎯 COORDINATES: {g.latlng[0]:.5f}, {g.latlng[1]:.5f}")
-                else:
-                    self.log("⚠️ GEOLOCATION FAILURE: INSUFFICIENT DATA")
-            except Exception as e:
-                self.log(f"⚠️ GEOLOCATION SERVICE UNAVAILABLE: {str(e)}")
-                
-        except Exception as e:
-            self.log(f"❗ CRITICAL ERROR IN TRACE OPERATION: {str(e)}")
+        threading.Thread(target=self.engine.trace, args=(imei,), daemon=True).start()
 
     def deactivate(self):
-        if self.tracking:
-            self.tracking = False
+        if self.engine.stop_tracking():
             self.log("⛔ TRACKING TERMINATED")
             self.log("🛡️ SYSTEM RETURNED TO STANDBY MODE")
 
-    def track_loop(self):
-        while self.tracking:
-            try:
-                info = self.gps.get_location()
-                self.data.update(info)
-                self.history.append((info['lat'], info['lon'], time.time()))
-                
-                logmsg = (f"📡 TARGET {self.data['imei']} → IP: {info['ip']} | ORG: {info['org']} "
-                         f"| LOCATION: {info['city']}, {info['country']} "
-                         f"| COORD: [{info['lat']:.5f},{info['lon']:.5f}] ±{info['accuracy']}km")
-                self.log(logmsg)
-            except Exception as e:
-                self.log(f"⚠️ TRACKING ERROR: {str(e)}")
-            time.sleep(REFRESH)
-
     def draw_map(self):
-        if not self.history:
+        if not self.engine.history:
             self.log("⚠️ NO LOCATION DATA AVAILABLE")
             messagebox.showwarning("No Data", "No location data available for mapping!")
             return
-            
-        # Get most recent location
-        lat, lon, timestamp = self.history[-1]
-        
+        if self.map_busy:
+            return
+        # The page itself pulls new fixes from the feed, so only the shell may need writing
+        self.map_busy = True
+        threading.Thread(target=self.render_map, daemon=True).start()
+
+    def render_map(self):
         try:
-            # Create map with dark theme and proper attribution
-            m = folium.Map(
-                location=[lat, lon], 
-                zoom_start=12,
-                tiles='CartoDB dark_matter',
-                attr='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors, &copy; <a href="https://carto.com/attribution">CARTO</a>'
-            )
-            
-            # Add toner layer with proper attribution
-            folium.TileLayer(
-                'Stamen Toner',
-                attr='Map tiles by <a href="http://stamen.com">Stamen Design</a>, under <a href="http://creativecommons.org/licenses/by/3.0">CC BY 3.0</a>. Data by <a href="http://openstreetmap.org">OpenStreetMap</a>, under <a href="http://creativecommons.org/licenses/by-sa/3.0">CC BY SA</a>',
-                name='Stamen Toner'
-            ).add_to(m)
-            
-            folium.LayerControl().add_to(m)
-            
-            # Add main marker
-            popup_text = (f"<b>TARGET: {self.data.get('imei', 'UNKNOWN')}</b><br>"
-                         f"IP: {self.data.get('ip', 'CLASSIFIED')}<br>"
-                         f"ORG: {self.data.get('org', 'UNKNOWN')}<br>"
-                         f"LOCATION: {self.data.get('city', 'Unknown')}, {self.data.get('country', 'Unknown')}<br>"
-                         f"LAST UPDATE: {datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            folium.Marker(
-                [lat, lon], 
-                tooltip="CURRENT POSITION",
-                popup=popup_text,
-                icon=folium.Icon(color='red', icon='crosshairs', prefix='fa')
-            ).add_to(m)
-            
-            # Add historical path
-            points = [(item[0], item[1]) for item in self.history]
-            folium.PolyLine(points, color="red", weight=2.5, opacity=0.7).add_to(m)
-            
-            # Add historical markers
-            for i, (lat, lon, ts) in enumerate(self.history):
-                if i == len(self.history)-1:  # Skip last point (already added)
-                    continue
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=3,
-                    color='#00ff00',
-                    fill=True,
-                    fill_color='#00ff00',
-                    fill_opacity=0.7,
-                    popup=f"HISTORICAL POINT {i+1}<br>{datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')}"
-                ).add_to(m)
-            
-            m.save(MAP_FILE)
-            webbrowser.open(f"http://localhost:{PORT}/{MAP_FILE.name}")
-            self.log("🗺️ VISUAL TRACKING MAP GENERATED")
-            self.log("🔐 MAP ACCESSIBLE AT LOCALHOST:5055")
+            if self.engine.prepare_map():
+                self.log("🗺️ VISUAL TRACKING MAP GENERATED")
+            webbrowser.open(self.engine.map_url)
+            self.log(f"🔐 MAP ACCESSIBLE AT LOCALHOST:{self.engine.port}")
         except Exception as e:
-            self.log(f"⚠️ MAP GENERATION ERROR: {str(e)}")
-            messagebox.showerror("Map Error", f"Failed to generate map: {str(e)}")
+            error = str(e)
+            self.log(f"⚠️ MAP GENERATION ERROR: {error}")
+            self.root.after(0, lambda: messagebox.showerror("Map Error", f"Failed to generate map: {error}"))
+        finally:
+            self.map_busy = False
 
     def clear_log(self):
+        # Scrollback is capped at CONSOLE_MAX_LINES, so this is a bounded reset
         if hasattr(self, 'console'):
             self.console.config(state='normal')
             self.console.delete(1.0, tk.END)
             self.console.config(state='disabled')
+            self.console_lines = 0
         self.log("🧹 CONSOLE PURGED")
         self.log("🔄 SYSTEM READY FOR NEW OPERATIONS")
 
-    def start_http_server(self):
-        # Wait for GUI to be ready before logging
-        while not hasattr(self, 'console'):
-            time.sleep(0.1)
-        
-        os.chdir(SAVE_DIR)
-        try:
-            with socketserver.TCPServer(("", PORT), SimpleHTTPRequestHandler) as httpd:
-                self.log(f"🌐 SECURE SERVER ACTIVE ON PORT {PORT}")
-                self.server_started = True
-                httpd.serve_forever()
-        except Exception as e:
-            self.log(f"❗ SERVER CRITICAL ERROR: {e}")
+def _print_json(obj):
+    print(json.dumps(obj, separators=(",", ":"), default=str), flush=True)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sigma_imei_tracking",
+                                     description="SIGMA tracker: Tk GUI by default, or headless subcommands")
+    parser.add_argument("--save-dir", default=str(SAVE_DIR), help="state directory (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("gui", help="start the Tk interface (default)")
+    sub.add_parser("locate", help="one-shot location of this host as JSON")
+    watch = sub.add_parser("watch", help="track periodically, one JSON object per fix on stdout")
+    watch.add_argument("--imei", default=None, help="target label recorded with each fix")
+    watch.add_argument("--interval", type=float, default=REFRESH, help="seconds between fixes")
+    watch.add_argument("--count", type=int, default=None, help="stop after N recorded fixes (failed lookups don't count)")
+    watch.add_argument("--serve", action="store_true",
+                       help=f"also serve the live map and {METRICS_PATH} on port {PORT}")
+    watch.add_argument("--profile", action="store_true", help="capture cProfile/tracemalloc reports")
+    trace = sub.add_parser("trace", help="carrier/region trace for an IMEI as JSON")
+    trace.add_argument("imei")
+    export = sub.add_parser("export-map", help="write a standalone HTML map of the recorded track")
+    export.add_argument("output")
+    export.add_argument("--since", type=float, default=None, help="start of window (unix time)")
+    export.add_argument("--until", type=float, default=None, help="end of window (unix time)")
+    formats = sorted(set(TrackExport.FORMATS.values()))
+    export = sub.add_parser("export", help="stream the recorded track to GeoJSON, GPX, CSV or columnar")
+    export.add_argument("output", help="format is taken from the suffix (.geojson, .geojsonl, .gpx, "
+                                       ".csv, .sigcol) unless --format is given")
+    export.add_argument("--format", choices=formats, default=None)
+    export.add_argument("--since", type=float, default=None, help="start of window (unix time)")
+    export.add_argument("--until", type=float, default=None, help="end of window (unix time)")
+    imp = sub.add_parser("import", help="append fixes from an exported track to the history")
+    imp.add_argument("file")
+    imp.add_argument("--format", choices=formats, default=None)
+    validate = sub.add_parser("validate", help="validate an IMEI inventory file (CSV or one per line)")
+    validate.add_argument("file")
+    validate.add_argument("--column", default="0", help="column index or header name")
+    validate.add_argument("--report", default=None, help="write a per-row CSV report here")
+    ipdb = sub.add_parser("compile-ipdb", help="compile a CSV of IP ranges into the offline lookup index")
+    ipdb.add_argument("source", help="CSV with a CIDR network or start/end columns plus latitude/longitude")
+    sub.add_parser("check-import-time", help=f"fail if cold import exceeds {IMPORT_BUDGET_MS} ms")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command = args.command or "gui"
+    if command == "gui":
+        SigmaTracker(save_dir=args.save_dir)
+        return 0
+    if command == "check-import-time":
+        ok, ms = check_import_budget()
+        print(f"import sigma_imei_tracking: {ms:.1f} ms (budget {IMPORT_BUDGET_MS} ms)")
+        return 0 if ok else 1
+    if command == "validate":
+        column = int(args.column) if args.column.isdigit() else args.column
+        _print_json(IMEIValidator.validate_file(args.file, args.report, column=column))
+        return 0
+    if command == "compile-ipdb":
+        _print_json(IPRangeDB.compile(args.source, Path(args.save_dir) / IP_DB_FILE.name))
+        return 0
+    engine = TrackerEngine(save_dir=args.save_dir)
+    try:
+        if command == "locate":
+            _print_json(engine.locate())
+        elif command == "trace":
+            imei, kind, error = IMEIValidator.validate(args.imei)
+            if error:
+                engine.log(f"⚠️ INVALID IMEI: {error}")
+                return 2
+            _print_json(engine.trace(imei))
+        elif command == "watch":
+            if args.imei:
+                engine.data['imei'] = args.imei
+            engine.refresh = args.interval
+            if args.serve:
+                engine.start_server()
+            if args.profile:
+                engine.profiler.start()
+            engine.tracking = True
+            try:
+                engine.track_loop(count=args.count, on_fix=_print_json)
+            except KeyboardInterrupt:
+                pass
+            if engine.profiler.active:
+                stats_path, mem_path = engine.profiler.stop()
+                engine.log(f"📊 PROFILE SAVED: {stats_path}, {mem_path}")
+        elif command == "export-map":
+            points = engine.export_map(args.output, args.since, args.until)
+            engine.log(f"🗺️ MAP WRITTEN: {args.output} ({points} fixes)")
+        elif command == "export":
+            rows = engine.export_history(args.output, args.format, args.since, args.until)
+            _print_json({"output": args.output, "fixes": rows})
+        elif command == "import":
+            imported, skipped = engine.import_history(args.file, args.format)
+            _print_json({"file": args.file, "imported": imported, "skipped": skipped})
+    finally:
+        engine.close()
+    return 0
 
 if __name__ == "__main__":
-    SigmaTracker()
+    # sigma_map_server imports its config and metrics from this module; run as a script,
+    # it must get this instance rather than a second copy with its own METRICS registry
+    sys.modules.setdefault("sigma_imei_tracking", sys.modules[__name__])
+    sys.exit(main())
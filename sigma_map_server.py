@@ -0,0 +1,197 @@
+"""Map server for the live map: static files from SAVE_DIR, Server-Sent Events and /metrics.
+
+Kept out of sigma_imei_tracking so a cold import doesn't pay for http.server;
+TrackerEngine.serve() imports it on first use.
+"""
+import functools
+import gzip
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from sigma_imei_tracking import (
+    COMPRESSIBLE_TYPES, GZIP_CACHE_ENTRIES, GZIP_MIN_SIZE, HTTP_REQUESTS, HTTP_SECONDS, MAP_FILE,
+    METRICS, METRICS_PATH, REFRESH, SAVE_DIR, SENDFILE_MIN_SIZE, SSE_KEEPALIVE, SSE_PATH, TRACK_FILE
+)
+
+class GzipCache:
+    """In-memory LRU of gzip-compressed file bodies, invalidated by mtime and size"""
+    def __init__(self, max_entries=GZIP_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # path -> (mtime_ns, size, data)
+        self._lock = threading.Lock()
+
+    def get(self, path, st):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self._entries.move_to_end(path)
+                return entry[2]
+        with open(path, "rb") as f:
+            data = gzip.compress(f.read(), compresslevel=6, mtime=0)
+        with self._lock:
+            self._entries[path] = (st.st_mtime_ns, st.st_size, data)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+class MapRequestHandler(SimpleHTTPRequestHandler):
+    """Static handler for SAVE_DIR with ETag/Last-Modified revalidation, gzip and sendfile"""
+    gzip_cache = GzipCache()
+    # SAVE_DIR also holds the journal, geo cache, console log and profiles: only these are public
+    served_files = frozenset({MAP_FILE.name, TRACK_FILE.name})
+    # Keep-alive for the page's repeated feed requests; no Nagle delay between headers and body
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, ".geojsonl": "application/geo+json-seq"}
+
+    def do_GET(self):
+        self._timed(head_only=False)
+
+    def do_HEAD(self):
+        self._timed(head_only=True)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def _timed(self, head_only):
+        self._status = None
+        self._streaming = False
+        start = time.monotonic()
+        try:
+            self._serve(head_only)
+        finally:
+            HTTP_REQUESTS.inc(code=self._status or 0)
+            if not self._streaming:
+                HTTP_SECONDS.observe(time.monotonic() - start)
+
+    def _send_metrics(self, head_only):
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def _stream_events(self, events):
+        self._streaming = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")
+        self.end_headers()
+        self.close_connection = True
+        q = events.subscribe()
+        try:
+            self.wfile.write(f"retry: {REFRESH * 1000}\n\n".encode())
+            while True:
+                try:
+                    seq, data = q.get(timeout=SSE_KEEPALIVE)
+                    chunk = f"id: {seq}\ndata: {data}\n\n"
+                except queue.Empty:
+                    chunk = ": ping\n\n"
+                self.wfile.write(chunk.encode("utf-8"))
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            events.unsubscribe(q)
+
+    def _serve(self, head_only):
+        if urlsplit(self.path).path == METRICS_PATH:
+            self._send_metrics(head_only)
+            return
+        events = getattr(self.server, "events", None)
+        if events is not None and not head_only and urlsplit(self.path).path == SSE_PATH:
+            self._stream_events(events)
+            return
+        if urlsplit(self.path).path.lstrip("/") not in self.served_files:
+            self.send_error(404, "File not found")
+            return
+        path = self.translate_path(self.path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        ctype = self.guess_type(path)
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        use_gzip = (st.st_size >= GZIP_MIN_SIZE
+                    and ctype.startswith(COMPRESSIBLE_TYPES)
+                    and "gzip" in self.headers.get("Accept-Encoding", ""))
+        if use_gzip:
+            etag = etag[:-1] + '-gz"'
+        if self._not_modified(etag, st.st_mtime):
+            self.send_response(304)
+            self._send_validators(etag, st.st_mtime)
+            self.end_headers()
+            return
+        body = None
+        if use_gzip:
+            try:
+                body = self.gzip_cache.get(path, st)
+            except OSError:
+                self.send_error(404, "File not found")
+                return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body) if body is not None else st.st_size))
+        self.send_header("Vary", "Accept-Encoding")
+        if body is not None:
+            self.send_header("Content-Encoding", "gzip")
+        self._send_validators(etag, st.st_mtime)
+        self.end_headers()
+        if head_only:
+            return
+        if body is not None:
+            self.wfile.write(body)
+            return
+        try:
+            # Exactly the Content-Length from the stat: the feed may grow meanwhile, and extra
+            # bytes would corrupt the next response on this keep-alive connection
+            with open(path, "rb") as f:
+                if st.st_size >= SENDFILE_MIN_SIZE:
+                    # Zero-copy from the page cache to the socket
+                    sent = self.connection.sendfile(f, count=st.st_size)
+                else:
+                    sent = self.wfile.write(f.read(st.st_size))
+            if sent < st.st_size:
+                # Replaced by a shorter file since the stat; the client can't reuse this connection
+                self.close_connection = True
+        except (OSError, ConnectionError):
+            self.close_connection = True
+
+    def _send_validators(self, etag, mtime):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+        # Let browsers keep a copy but always revalidate (cheap 304s)
+        self.send_header("Cache-Control", "no-cache")
+
+    def _not_modified(self, etag, mtime):
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            return etag in [tag.strip() for tag in inm.split(",")] or inm.strip() == "*"
+        ims = self.headers.get("If-Modified-Since")
+        if ims:
+            try:
+                return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError, OverflowError):
+                return False
+        return False
+
+class MapServer(ThreadingHTTPServer):
+    """Threaded server rooted at a directory without touching the process working directory"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, directory=SAVE_DIR, handler=MapRequestHandler, events=None):
+        self.events = events
+        super().__init__(address, functools.partial(handler, directory=str(directory)))
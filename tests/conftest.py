@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sigma_imei_tracking as sit
+
+class FakeClock:
+    """Stands in for the time module inside sigma_imei_tracking; only moves when told to"""
+    def __init__(self, start=1_000.0):
+        self.now = start
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1_700_000_000.0 + self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sit, "time", clock)
+    return clock
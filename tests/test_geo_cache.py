@@ -0,0 +1,99 @@
+"""Geolocation cache and the public-IP probe in front of it"""
+import pytest
+
+import sigma_imei_tracking as sit
+
+FIX = {"lat": 51.5074, "lon": -0.1278, "city": "London", "country": "United Kingdom",
+       "org": "AS64500 Example Net", "ip": "203.0.113.7", "accuracy": 5}
+
+def fix(ip, **kw):
+    return dict(FIX, ip=ip, **kw)
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = sit.GeoCache(tmp_path / "geo_cache.json", ttl=60)
+    cache.put("203.0.113.7", FIX)
+    cache.put("203.0.113.8", fix("203.0.113.8"), ttl=300)
+    clock.advance(59)
+    assert cache.get("203.0.113.7") == FIX
+    clock.advance(2)
+    assert cache.get("203.0.113.7") is None
+    assert cache.get("203.0.113.8")["ip"] == "203.0.113.8"
+    assert len(cache) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_lru_eviction_follows_reads(tmp_path):
+    cache = sit.GeoCache(tmp_path / "geo_cache.json", max_entries=2)
+    cache.put("a", fix("a"))
+    cache.put("b", fix("b"))
+    assert cache.get("a")
+    cache.put("c", fix("c"))
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+def test_ignores_unknown_ips_and_hands_out_copies(tmp_path):
+    cache = sit.GeoCache(tmp_path / "geo_cache.json")
+    cache.put("Unknown", FIX)
+    cache.put(None, FIX)
+    assert len(cache) == 0
+    cache.put("a", fix("a"))
+    cache.get("a")["city"] = "Paris"
+    assert cache.get("a")["city"] == "London"
+
+def test_reload_keeps_order_and_drops_expired(tmp_path, clock):
+    path = tmp_path / "geo_cache.json"
+    cache = sit.GeoCache(path, ttl=100)
+    cache.put("old", fix("old"), ttl=10)
+    cache.put("a", fix("a"))
+    cache.put("b", fix("b"))
+    cache.get("a")
+    cache.save()
+    clock.advance(20)
+    reloaded = sit.GeoCache(path, max_entries=1)
+    assert len(reloaded) == 1
+    assert reloaded.get("a")["ip"] == "a"
+    assert reloaded.get("b") is None and reloaded.get("old") is None
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "geo_cache.json"
+    path.write_text("{not json")
+    assert len(sit.GeoCache(path)) == 0
+
+class DownTransport:
+    """Provider transport whose every request fails"""
+    timeout = sit.PROVIDER_TIMEOUT
+
+    def __init__(self):
+        self.timeouts = []
+
+    def get(self, url, timeout=None):
+        self.timeouts.append(timeout)
+        raise ConnectionError("unreachable")
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def gps(tmp_path):
+    gps = sit.GPSTracker(transport=DownTransport(), cache=sit.GeoCache(tmp_path / "geo_cache.json"))
+    yield gps
+    gps.close()
+
+def test_get_location_serves_cache_while_ip_unchanged(gps):
+    lookups = []
+    gps.current_ip = lambda: "203.0.113.7"
+    gps.lookup = lambda end=None: lookups.append(end) or dict(FIX)
+    assert gps.get_location() == FIX
+    assert gps.get_location() == FIX
+    assert len(lookups) == 1
+    gps.current_ip = lambda: "198.51.100.1"
+    assert gps.get_location()["ip"] == "203.0.113.7"
+    assert len(lookups) == 2
+    assert gps.cache.get("198.51.100.1")["ip"] == "203.0.113.7"
+
+def test_ip_probe_is_budgeted_and_skipped_while_tripped(gps):
+    for _ in range(sit.BREAKER_THRESHOLD):
+        assert gps.current_ip() is None
+    assert gps.transport.timeouts == [sit.IP_CHECK_TIMEOUT] * sit.BREAKER_THRESHOLD
+    assert gps.health.is_open("ip_check")
+    assert gps.current_ip() is None
+    assert len(gps.transport.timeouts) == sit.BREAKER_THRESHOLD
@@ -0,0 +1,58 @@
+"""Provider health scoring and circuit breakers"""
+import pytest
+
+import sigma_imei_tracking as sit
+
+@pytest.fixture
+def board(clock):
+    return sit.HealthBoard(threshold=3, cooldown=60, window=10)
+
+def names(board, services):
+    return board.ordered(services, lambda name: name)
+
+def test_breaker_trips_after_consecutive_failures(board, clock):
+    board.record("a", 0.1, False, status=503, error="HTTP 503")
+    board.record("a", 0.1, False, status=503, error="HTTP 503")
+    board.record("a", 0.1, True)
+    board.record("a", 0.1, False)
+    board.record("a", 0.1, False)
+    assert not board.is_open("a")
+    board.record("a", 0.1, False, error="timeout")
+    assert board.is_open("a")
+    snap = board.snapshot()["a"]
+    assert (snap["breaker"], snap["trips"], snap["failures"], snap["last_error"]) == ("open", 1, 5, "timeout")
+    assert snap["status"] == {503: 2}
+    assert names(board, ["a", "b"]) == ["b"]
+    clock.advance(59)
+    assert names(board, ["a", "b"]) == ["b"]
+
+def test_half_open_retrips_on_one_failure_and_closes_on_success(board, clock):
+    for _ in range(3):
+        board.record("a", 0.1, False)
+    clock.advance(61)
+    assert not board.is_open("a")
+    assert "a" in names(board, ["a"])
+    board.record("a", 0.1, False)
+    assert board.is_open("a")
+    assert board.snapshot()["a"]["trips"] == 2
+    clock.advance(61)
+    board.record("a", 0.1, True)
+    board.record("a", 0.1, False)
+    board.record("a", 0.1, False)
+    assert not board.is_open("a")
+
+def test_ordered_prefers_unmeasured_then_fast_then_reliable(board):
+    board.record("slow", 2.0, True)
+    board.record("fast", 0.2, True)
+    board.record("flaky", 0.1, True)
+    board.record("flaky", 0.1, False)
+    assert names(board, ["slow", "flaky", "fast", "new"]) == ["new", "fast", "slow", "flaky"]
+
+def test_throttled_since(board, clock):
+    start = clock.monotonic()
+    board.record("a", 0.1, False, status=503)
+    assert not board.throttled_since(start)
+    clock.advance(1)
+    board.record("a", 0.1, False, status=429)
+    assert board.throttled_since(start)
+    assert not board.throttled_since(clock.monotonic())
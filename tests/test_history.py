@@ -0,0 +1,114 @@
+"""Journal durability and history export/import round-trips"""
+import json
+import struct
+
+import pytest
+
+import sigma_imei_tracking as sit
+
+FIXES = [(51.5 + i * 1e-5, -0.12 - i * 1e-5, 1_700_000_000.0 + 8 * i) for i in range(250)]
+
+def columns(fixes):
+    lats, lons, stamps = zip(*fixes)
+    return list(lats), list(lons), list(stamps)
+
+def collect(chunks):
+    out = []
+    for lats, lons, stamps in chunks:
+        assert len(lats) == len(lons) == len(stamps)
+        out.extend(zip(lats, lons, stamps))
+    return out
+
+def chunked(fixes, size=64):
+    for i in range(0, len(fixes), size):
+        yield tuple(map(list, zip(*fixes[i:i + size])))
+
+def test_journal_roundtrip_and_window(tmp_path):
+    journal = sit.HistoryJournal(tmp_path / "history.bin")
+    for lat, lon, ts in FIXES:
+        journal.append(lat, lon, ts)
+    lats, lons, stamps = journal.read(FIXES[10][2], FIXES[19][2])
+    assert list(zip(lats, lons, stamps)) == FIXES[10:20]
+    assert collect(journal.chunks(chunk_rows=7)) == FIXES
+    assert list(journal.read(limit=3)[2]) == [ts for _, _, ts in FIXES[-3:]]
+    journal.close()
+
+def test_journal_drops_torn_record(tmp_path):
+    path = tmp_path / "history.bin"
+    journal = sit.HistoryJournal(path)
+    for lat, lon, ts in FIXES[:5]:
+        journal.append(lat, lon, ts)
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(struct.pack("<dd", 1.0, 2.0))  # crash mid-record
+    journal = sit.HistoryJournal(path)
+    assert path.stat().st_size == len(sit.JOURNAL_MAGIC) + 5 * sit.JOURNAL_RECORD.size
+    journal.append(*FIXES[5])
+    assert list(zip(*journal.read())) == FIXES[:6]
+    journal.close()
+
+def test_history_load_respects_capacity(tmp_path):
+    journal = sit.HistoryJournal(tmp_path / "history.bin")
+    for lat, lon, ts in FIXES:
+        journal.append(lat, lon, ts)
+    history = sit.TrackHistory(capacity=100)
+    assert journal.load_into(history) == 100
+    assert list(history) == FIXES[-100:]
+    journal.close()
+
+@pytest.mark.parametrize("suffix", [".geojson", ".geojsonl", ".gpx", ".csv", ".sigcol"])
+def test_export_import_roundtrip(tmp_path, suffix):
+    path = tmp_path / f"track{suffix}"
+    assert sit.TrackExport.write(path, chunked(FIXES), name="490154203237518") == len(FIXES)
+    back = collect(sit.TrackExport.read(path, chunk_rows=50))
+    assert len(back) == len(FIXES)
+    for (lat, lon, ts), (lat2, lon2, ts2) in zip(FIXES, back):
+        assert (lat2, lon2) == (lat, lon)
+        assert ts2 == pytest.approx(ts, abs=1e-3)  # GeoJSON/GPX keep millisecond timestamps
+
+def test_export_of_empty_history(tmp_path):
+    for suffix in (".geojson", ".csv", ".sigcol"):
+        path = tmp_path / f"empty{suffix}"
+        assert sit.TrackExport.write(path, iter(())) == 0
+        assert collect(sit.TrackExport.read(path)) == []
+    json.loads((tmp_path / "empty.geojson").read_text())
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        sit.TrackExport.write(tmp_path / "track.kml", chunked(FIXES))
+
+def test_columnar_reader_views_and_window(tmp_path):
+    path = tmp_path / "track.sigcol"
+    sit.TrackExport.write(path, chunked(FIXES))
+    with sit.ColumnarTrack(path) as track:
+        assert len(track) == len(FIXES)
+        lats, lons, stamps = track.columns()
+        assert (lats[3], lons[3], stamps[3]) == FIXES[3]
+        lats, lons, stamps = track.between(FIXES[100][2], FIXES[104][2])
+        assert list(zip(lats, lons, stamps)) == FIXES[100:105]
+
+def test_columnar_reader_rejects_truncated_file(tmp_path):
+    path = tmp_path / "track.sigcol"
+    sit.TrackExport.write(path, chunked(FIXES))
+    data = path.read_bytes()
+    path.write_bytes(data[:-8])
+    with pytest.raises(ValueError, match="truncated"):
+        sit.ColumnarTrack(path)
+    path.write_bytes(b"NOTSIGCOL" + data[9:])
+    with pytest.raises(ValueError):
+        sit.ColumnarTrack(path)
+
+def test_engine_import_keeps_time_order(tmp_path):
+    source = tmp_path / "track.csv"
+    sit.TrackExport.write(source, chunked(FIXES))
+    engine = sit.TrackerEngine(save_dir=tmp_path / "state", log=lambda msg: None)
+    try:
+        engine.record({"lat": 0.5, "lon": 0.5}, ts=FIXES[99][2])
+        assert engine.import_history(source) == (150, 100)
+        stamps = engine.journal.read()[2]
+        assert list(stamps) == sorted(stamps)
+        assert len(engine.history) == 151
+        out = tmp_path / "out.sigcol"
+        assert engine.export_history(out, t0=FIXES[200][2]) == 50
+    finally:
+        engine.close()
@@ -0,0 +1,70 @@
+"""IMEI/IMEISV validation: scalar, batch and streaming paths agree"""
+import csv
+import random
+
+import pytest
+
+import sigma_imei_tracking as sit
+
+def luhn_imei(body):
+    return body + str(sit.IMEIValidator.check_digit(body))
+
+def sample_values(n=500, seed=7):
+    rng = random.Random(seed)
+    values = []
+    for i in range(n):
+        body = "".join(rng.choice("0123456789") for _ in range(14))
+        kind = i % 8
+        if kind == 0:
+            values.append(luhn_imei(body))
+        elif kind == 1:
+            good = luhn_imei(body)
+            values.append(good[:14] + str((int(good[14]) + 1) % 10))
+        elif kind == 2:
+            values.append(body + "12")  # IMEISV
+        elif kind == 3:
+            values.append(f"{body[:2]}-{body[2:8]}-{luhn_imei(body)[8:]}")
+        elif kind == 4:
+            values.append(body[:13])
+        elif kind == 5:
+            values.append(body[:14] + "x")
+        elif kind == 6:
+            values.append("")
+        else:
+            values.append(" " + body[:8] + "." + body[8:] + "5 ")
+    return values
+
+def test_known_identifiers():
+    assert sit.IMEIValidator.validate("490154203237518") == ("490154203237518", "IMEI", None)
+    assert sit.IMEIValidator.validate("49-015420-323751-8")[2] is None
+    value, kind, error = sit.IMEIValidator.validate("490154203237519")
+    assert kind == "IMEI" and error == "check digit mismatch (expected 8)"
+    assert sit.IMEIValidator.validate("4901542032375101")[1:] == ("IMEISV", None)
+    assert sit.IMEIValidator.validate("49015420323751")[2] == "bad length 14"
+    assert sit.IMEIValidator.tac("490154203237518") == "49015420"
+
+@pytest.mark.parametrize("numpy", [True, False], ids=["vectorized", "scalar"])
+def test_validate_many_matches_validate(monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(sit.IMEIValidator, "_np", None)
+    values = sample_values()
+    assert sit.IMEIValidator.validate_many(values) == [sit.IMEIValidator.validate(v) for v in values]
+
+def test_validate_file_report(tmp_path):
+    values = sample_values(200)
+    src = tmp_path / "inventory.csv"
+    with open(src, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["owner", "imei"])
+        writer.writerows([f"user{i}", v] for i, v in enumerate(values))
+    report = tmp_path / "report.csv"
+    summary = sit.IMEIValidator.validate_file(src, report, column="imei", chunk_rows=64)
+    expected = [sit.IMEIValidator.validate(v) for v in values]
+    assert summary["rows"] == len(values)
+    assert summary["valid"] == sum(1 for _, _, error in expected if error is None)
+    with open(report, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["row"] for row in rows] == [str(i + 2) for i in range(len(values))]
+    assert [row["valid"] == "1" for row in rows] == [error is None for _, _, error in expected]
@@ -0,0 +1,86 @@
+"""Compiled offline IP-range database"""
+import pytest
+
+import sigma_imei_tracking as sit
+
+CSV = """network,latitude,longitude,city,country_name,org,accuracy_radius
+203.0.113.0/24,51.5074,-0.1278,London,United Kingdom,AS64500 Example Net,5
+198.51.100.0/25,48.8566,2.3522,Paris,France,,
+198.51.100.64/26,0,0,Shadowed,Nowhere,,
+2001:db8::/32,1,2,V6,Nowhere,,
+10.0.0.0/8,,,Missing,Coordinates,,
+"""
+
+RANGES = """ip_from,ip_to,lat,lon,city,country
+16777216,16777471,-27.47,153.02,Brisbane,Australia
+1.0.1.0,1.0.3.255,26.06,119.30,Fuzhou,China
+"""
+
+@pytest.fixture
+def db(tmp_path):
+    source = tmp_path / "ip_ranges.csv"
+    source.write_text(CSV)
+    summary = sit.IPRangeDB.compile(source, tmp_path / "ip_ranges.idx")
+    assert (summary["ranges"], summary["skipped"]) == (2, 3)
+    db = sit.IPRangeDB(tmp_path / "ip_ranges.idx")
+    yield db
+    db.close()
+
+def test_lookup_hits_and_range_edges(db):
+    hit = db.lookup("203.0.113.7")
+    assert hit == {"lat": 51.5074, "lon": -0.1278, "city": "London", "country": "United Kingdom",
+                   "org": "AS64500 Example Net", "ip": "203.0.113.7", "accuracy": 5}
+    assert db.lookup("203.0.113.0")["city"] == "London"
+    assert db.lookup("203.0.113.255")["city"] == "London"
+    assert db.lookup("203.0.114.0") is None
+    assert db.lookup("203.0.112.255") is None
+
+def test_defaults_overlaps_and_unsupported_input(db):
+    paris = db.lookup("198.51.100.100")
+    assert (paris["city"], paris["org"], paris["accuracy"]) == ("Paris", "Unknown", sit.IP_DB_ACCURACY)
+    assert db.lookup("198.51.100.128") is None
+    assert db.lookup("2001:db8::1") is None
+    assert db.lookup("10.1.2.3") is None
+    assert db.lookup("not an ip") is None
+    assert db.lookup("0.0.0.0") is None
+
+def test_start_end_columns(tmp_path):
+    source = tmp_path / "ranges.csv"
+    source.write_text(RANGES)
+    sit.IPRangeDB.compile(source, tmp_path / "ranges.idx")
+    with_db = sit.IPRangeDB(tmp_path / "ranges.idx")
+    try:
+        assert len(with_db) == 2
+        assert with_db.lookup("1.0.0.1")["city"] == "Brisbane"
+        assert with_db.lookup("1.0.2.9")["city"] == "Fuzhou"
+        assert with_db.lookup("1.0.4.0") is None
+    finally:
+        with_db.close()
+
+def test_rejects_foreign_and_truncated_files(tmp_path, db):
+    data = db.path.read_bytes()
+    bad = tmp_path / "bad.idx"
+    bad.write_bytes(b"X" * len(data))
+    with pytest.raises(ValueError):
+        sit.IPRangeDB(bad)
+    bad.write_bytes(data[:-4])
+    with pytest.raises(ValueError, match="truncated"):
+        sit.IPRangeDB(bad)
+
+def test_load_uses_existing_index(tmp_path):
+    assert sit.IPRangeDB.load(tmp_path) is None
+    (tmp_path / sit.IP_DB_SOURCE.name).write_text(CSV)
+    sit.IPRangeDB.compile(tmp_path / sit.IP_DB_SOURCE.name, tmp_path / sit.IP_DB_FILE.name)
+    db = sit.IPRangeDB.load(tmp_path)
+    try:
+        assert db.lookup("203.0.113.9")["city"] == "London"
+    finally:
+        db.close()
+
+def test_tracker_prefers_offline_database(db):
+    gps = sit.GPSTracker(ip_db=db)
+    try:
+        assert gps.services[0] == gps._local_db
+        assert gps.locate_ip("198.51.100.1")["city"] == "Paris"
+    finally:
+        gps.close()
@@ -0,0 +1,110 @@
+"""Refresh scheduling and the tracking worker"""
+import threading
+import time
+
+import pytest
+
+import sigma_imei_tracking as sit
+
+class FakeEvent:
+    """Cancellation event whose wait() advances the fake clock instead of sleeping"""
+    def __init__(self, clock):
+        self.clock = clock
+        self.flag = False
+        self.waits = []
+
+    def is_set(self):
+        return self.flag
+
+    def set(self):
+        self.flag = True
+
+    def wait(self, timeout):
+        if self.flag:
+            return True
+        self.waits.append(round(timeout, 6))
+        self.clock.advance(timeout)
+        return self.flag
+
+@pytest.fixture
+def scheduler(clock):
+    scheduler = sit.RefreshScheduler(8, max_interval=30, backoff=2, stable_ticks=2)
+    scheduler._cancel = FakeEvent(clock)
+    return scheduler
+
+def run(scheduler, clock, work):
+    """Tick times and missed counts, spending work[i] seconds inside tick i"""
+    ticks = []
+    for i, missed in enumerate(scheduler.ticks()):
+        ticks.append((clock.now, missed))
+        if i == len(work):
+            scheduler.stop()
+            continue
+        clock.advance(work[i])
+    return ticks
+
+def test_ticks_stay_on_the_grid(scheduler, clock):
+    ticks = run(scheduler, clock, [3, 0.5, 7.9])
+    assert ticks == [(1000, 0), (1008, 0), (1016, 0), (1024, 0)]
+    assert scheduler._cancel.waits == [5, 7.5, 0.1]
+
+def test_overrun_skips_missed_ticks(scheduler, clock):
+    ticks = run(scheduler, clock, [20, 8, 1])
+    # 20 s of work misses the 1008 and 1016 ticks; the next one fires on the grid at 1024
+    assert ticks == [(1000, 0), (1024, 2), (1040, 1), (1048, 0)]
+    assert scheduler.skipped == 3
+
+def test_adapt_backs_off_and_snaps_back(scheduler):
+    assert scheduler.adapt(True) == 8
+    assert scheduler.adapt(False) == 8
+    assert scheduler.adapt(False) == 16
+    assert scheduler.adapt(False) == 30
+    assert scheduler.adapt(False) == 30
+    assert scheduler.adapt(True) == 8
+    assert scheduler.adapt(True, throttled=True) == 16
+    assert scheduler.adapt(True) == 8
+
+def test_stop_wakes_a_waiting_loop():
+    scheduler = sit.RefreshScheduler(60)
+    ticks = []
+    worker = threading.Thread(target=lambda: ticks.extend(scheduler.ticks()))
+    worker.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    scheduler.stop()
+    worker.join(2)
+    assert not worker.is_alive()
+    assert time.monotonic() - start < 1
+    assert ticks == [0]
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sit.TrackerEngine(save_dir=tmp_path, log=lambda msg: None, refresh=60)
+    fix = dict(sit.GPSTracker._empty_location(), lat=51.5, lon=-0.12, ip="203.0.113.7", accuracy=5)
+    engine.gps.get_location = lambda: dict(fix)
+    yield engine
+    engine.stop_tracking()
+    engine.close()
+
+def test_single_worker_and_immediate_stop(engine):
+    assert engine.start_tracking("490154203237518")
+    first = engine._worker
+    assert not engine.start_tracking("490154203237518")
+    assert engine._worker is first
+    deadline = time.monotonic() + 2
+    while len(engine.history) < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(engine.history) == 1
+    assert engine.stop_tracking()
+    first.join(1)
+    assert not first.is_alive()
+    assert engine.start_tracking("490154203237518")
+    assert engine._worker is not first
+
+def test_track_loop_counts_recorded_fixes(engine):
+    fixes = iter([sit.GPSTracker._empty_location(), engine.gps.get_location()] * 3)
+    engine.gps.get_location = lambda: next(fixes)
+    recorded = []
+    engine.track_loop(count=2, on_fix=recorded.append, scheduler=sit.RefreshScheduler(0.01))
+    assert len(recorded) == 2
+    assert len(engine.history) == 2